@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from core.models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("pk", "name", "attempts", "run_after", "dead")
+    list_filter = ("name", "dead")
+    readonly_fields = ("owner", "locked_until", "last_error", "created")
+
+
+admin.site.register(Task, TaskAdmin)
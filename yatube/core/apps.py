@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        from core.checks import debug_tooling
+        from core.sqlite import tune_connection
+
+        connection_created.connect(tune_connection)
+        # Системные проверки не выполняются при запуске WSGI-сервера,
+        # поэтому отладочные инструменты в production останавливают запуск
+        # сразу.
+        errors = debug_tooling()
+        if errors:
+            raise ImproperlyConfigured(
+                "\n".join(error.msg for error in errors)
+            )
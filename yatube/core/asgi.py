@@ -0,0 +1,350 @@
+"""ASGI-приложение для синхронного Django 2.2.
+
+В Django 2.2 нет асинхронных представлений и промежуточных слоёв, поэтому
+ASGIHandler делает асинхронной работу с соединением: тело запроса
+читается и готовый ответ отправляется в цикле событий, а обработка
+запроса (промежуточные слои, представление, ORM, шаблоны) идёт в пуле из
+ASGI_THREADS потоков. Медленный клиент занимает корутину, а не поток, и
+запросы остальных клиентов обрабатываются пулом параллельно.
+
+Потоковые ответы (StreamingHttpResponse, FileResponse) отдаются прямо из
+потока пула: курсор базы нельзя передавать между потоками.
+
+Адреса из ASGI_ROUTES обслуживают асинхронные функции (handler, scope,
+receive, send) в цикле событий, минуя Django: так долгие соединения
+вроде потоков SSE не занимают потоки пула. Синхронный код (ORM) такие
+функции выполняют в пуле через await handler.run(...).
+
+serve() -- небольшой HTTP/1.1-сервер на asyncio для разработки и замеров
+(команда runasgi). В бою yatube.asgi:application запускается любым
+ASGI-сервером: uvicorn, daphne, hypercorn.
+"""
+import asyncio
+import functools
+import io
+import logging
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote
+
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.handlers import base
+from django.core.handlers.wsgi import WSGIRequest, get_script_name
+from django.db import close_old_connections
+from django.urls import set_script_prefix
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger("yatube.asgi")
+
+# Заголовок запроса на сервере не длиннее, иначе соединение закрывается
+MAX_HEAD_SIZE = 64 * 1024
+
+
+def environ(scope, body):
+    """Окружение WSGI для запроса ASGI; body -- файл с телом запроса."""
+    host, port = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # В WSGI путь -- байты UTF-8, прочитанные как latin-1.
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": host,
+        "SERVER_PORT": str(port),
+        "REMOTE_ADDR": client[0],
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", ()):
+        name = name.decode("latin-1")
+        # Как и runserver, отбрасываем заголовки с «_»: в окружении их
+        # не отличить от заголовков с «-».
+        if "_" in name:
+            continue
+        name = name.upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin-1")
+        if name in environ:
+            value = f"{environ[name]},{value}"
+        environ[name] = value
+    if "CONTENT_LENGTH" not in environ:
+        # Тело могло прийти без Content-Length, например частями (chunked).
+        environ["CONTENT_LENGTH"] = str(body.seek(0, io.SEEK_END))
+        body.seek(0)
+    return environ
+
+
+def response_headers(response):
+    headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in response.items()
+    ]
+    headers += [
+        (b"Set-Cookie", cookie.output(header="").strip().encode("latin-1"))
+        for cookie in response.cookies.values()
+    ]
+    return headers
+
+
+class ASGIHandler(base.BaseHandler):
+    request_class = WSGIRequest
+
+    def __init__(self, threads=None):
+        super().__init__()
+        self.load_middleware()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix="asgi",
+        )
+        self.routes = {
+            path: import_string(endpoint)
+            for path, endpoint in settings.ASGI_ROUTES.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Неподдерживаемое соединение: {scope['type']}")
+        endpoint = self.routes.get(scope["path"])
+        if endpoint is not None:
+            return await endpoint(self, scope, receive, send)
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor,
+                self.respond,
+                environ(scope, body),
+                loop,
+                send,
+            )
+        finally:
+            body.close()
+        if result is not None:
+            status, headers, content = result
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": headers,
+                }
+            )
+            await send({"type": "http.response.body", "body": content})
+
+    def _run(self, function, args):
+        try:
+            return function(*args)
+        finally:
+            close_old_connections()
+
+    async def run(self, function, *args):
+        """Выполняет синхронную функцию в потоке пула."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self._run, function, args
+        )
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        """Тело запроса во временном файле; None, если клиент ушёл."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, mode="w+b"
+        )
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                return None
+            body.write(message.get("body", b""))
+            if not message.get("more_body", False):
+                body.seek(0)
+                return body
+
+    def respond(self, environ, loop, send):
+        """Обрабатывает запрос в потоке пула.
+
+        Возвращает код, заголовки и тело ответа, которые отправит цикл
+        событий, или None, если потоковый ответ уже отправлен отсюда.
+        """
+        set_script_prefix(get_script_name(environ))
+        signals.request_started.send(sender=self.__class__, environ=environ)
+        request = self.request_class(environ)
+        response = self.get_response(request)
+        try:
+            status, headers = response.status_code, response_headers(response)
+            if not response.streaming:
+                return status, headers, response.content
+
+            def forward(message):
+                asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+            forward(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": headers,
+                }
+            )
+            for chunk in response:
+                forward(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": True,
+                    }
+                )
+            forward({"type": "http.response.body", "body": b""})
+            return None
+        finally:
+            # Как и в WSGIHandler: request_finished закрывает соединения с
+            # базой этого потока.
+            response.close()
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ASGIHandler()
+
+
+def _status_line(status):
+    try:
+        phrase = HTTPStatus(status).phrase
+    except ValueError:
+        phrase = ""
+    return f"HTTP/1.1 {status} {phrase}"
+
+
+async def _read_request(reader):
+    """Строка запроса, заголовки и тело; None, если запрос не пришёл."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        return None
+    request_line, *lines = head.decode("latin-1").rstrip("\r\n").split("\r\n")
+    try:
+        method, target, version = request_line.split(" ")
+    except ValueError:
+        return None
+    headers = []
+    for line in lines:
+        name, _, value = line.partition(":")
+        headers.append((name.strip().lower(), value.strip()))
+    length = dict(headers).get("content-length", "0")
+    body = await reader.readexactly(int(length)) if length.isdigit() else b""
+    return method, target, version, headers, body
+
+
+def _scope(request, writer):
+    method, target, version, headers, _ = request
+    path, _, query = target.partition("?")
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": version.rpartition("/")[2],
+        "method": method.upper(),
+        "scheme": "http",
+        "path": unquote(path),
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": [
+            (name.encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ],
+        "server": writer.get_extra_info("sockname")[:2],
+        "client": writer.get_extra_info("peername")[:2],
+    }
+
+
+class _Exchange:
+    """receive и send приложения для одного соединения."""
+
+    def __init__(self, reader, writer, body):
+        self.reader = reader
+        self.writer = writer
+        self.body = body
+
+    async def receive(self):
+        if self.body is not None:
+            body, self.body = self.body, None
+            return {"type": "http.request", "body": body}
+        # Дальше клиент ничего не шлёт: ждём, пока он закроет соединение.
+        while await self.reader.read(65536):
+            pass
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            lines = [_status_line(message["status"])]
+            lines += [
+                f"{name.decode('latin-1')}: {value.decode('latin-1')}"
+                for name, value in message.get("headers", ())
+            ]
+            lines.append("Connection: close")
+            head = "\r\n".join(lines) + "\r\n\r\n"
+            self.writer.write(head.encode("latin-1"))
+        elif message["type"] == "http.response.body":
+            self.writer.write(message.get("body", b""))
+            await self.writer.drain()
+
+
+async def _connection(application, reader, writer):
+    """Один запрос на соединение (Connection: close)."""
+    try:
+        request = await _read_request(reader)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        request = None
+    if request is None:
+        writer.close()
+        return
+    exchange = _Exchange(reader, writer, request[-1])
+    try:
+        await application(
+            _scope(request, writer), exchange.receive, exchange.send
+        )
+    except ConnectionError:
+        pass
+    except Exception:
+        logger.exception("Ошибка при обработке %s %s", *request[:2])
+    finally:
+        writer.close()
+
+
+async def serve(application, host="127.0.0.1", port=8000, started=None):
+    """Принимает соединения, пока задачу не отменят; started(server)
+    вызывается, когда порт открыт."""
+    server = await asyncio.start_server(
+        functools.partial(_connection, application),
+        host,
+        port,
+        limit=MAX_HEAD_SIZE,
+    )
+    if started is not None:
+        started(server)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,267 @@
+"""Бэкенды кэша для запуска в несколько процессов.
+
+SQLiteCache -- общий кэш в файле SQLite, которому не нужен отдельный
+сервер. TwoTierCache -- небольшой LRU-кэш в памяти процесса перед общим
+кэшем; ключи версий (см. posts.caching) всегда читаются из общего кэша,
+поэтому сброс версии в одном процессе сразу виден во всех.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Отличает отсутствующий ключ от сохранённого None.
+MISSING = object()
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в отдельном файле SQLite, общий для всех процессов сервера."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Размер таблицы проверяется не при каждой записи, а раз в CULL_EVERY.
+    CULL_EVERY = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _expiry(self, timeout):
+        # Метка времени истечения; None -- значение не истекает.
+        return self.get_backend_timeout(timeout)
+
+    def _read(self, key):
+        row = self._connection.execute(
+            "SELECT value FROM cache WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return MISSING if row is None else pickle.loads(row[0])
+
+    def _write(self, key, value, timeout, mode="REPLACE"):
+        cursor = self._connection.execute(
+            f"INSERT OR {mode} INTO cache (key, value, expires) "
+            "VALUES (?, ?, ?)",
+            (
+                key,
+                pickle.dumps(value, self.pickle_protocol),
+                self._expiry(timeout),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    def _cull(self):
+        connection = self._connection
+        connection.execute(
+            "DELETE FROM cache WHERE expires <= ?", (time.time(),)
+        )
+        (count,) = connection.execute("SELECT COUNT(*) FROM cache").fetchone()
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache "
+                "ORDER BY expires IS NULL, expires LIMIT ?)",
+                (count // self._cull_frequency,),
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM cache WHERE key = ? AND expires <= ?",
+                (key, time.time()),
+            )
+            added = self._write(key, value, timeout, mode="IGNORE")
+        finally:
+            connection.execute("COMMIT")
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._read(key)
+        return default if value is MISSING else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout)
+        self._writes += 1
+        if self._writes % self.CULL_EVERY == 0:
+            self._cull()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connection.execute(
+            "UPDATE cache SET expires = ? WHERE key = ? "
+            "AND (expires IS NULL OR expires > ?)",
+            (self._expiry(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._read(key) is not MISSING
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            value = self._read(key)
+            if value is MISSING:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            connection.execute(
+                "UPDATE cache SET value = ? WHERE key = ?",
+                (pickle.dumps(value, self.pickle_protocol), key),
+            )
+        finally:
+            connection.execute("COMMIT")
+        return value
+
+    def clear(self):
+        self._connection.execute("DELETE FROM cache")
+
+    def close(self, **kwargs):
+        # Соединение живёт в потоке дольше запроса и закрывается с ним.
+        pass
+
+
+class TwoTierCache(BaseCache):
+    """Локальный LRU-кэш процесса перед общим кэшем.
+
+    Параметры OPTIONS:
+      SHARED -- имя общего кэша в settings.CACHES;
+      LOCAL_TIMEOUT -- сколько секунд значение живёт в памяти процесса;
+      LOCAL_MAX_ENTRIES -- размер локального кэша;
+      SHARED_ONLY_PREFIXES -- префиксы ключей, которые читаются только
+      из общего кэша (счётчики версий).
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get("OPTIONS", {}))
+        self._shared_alias = options.pop("SHARED", "shared")
+        self._local_timeout = options.pop("LOCAL_TIMEOUT", 5)
+        self._shared_only = tuple(
+            options.pop("SHARED_ONLY_PREFIXES", ("feed-version:",))
+        )
+        local_max_entries = options.pop("LOCAL_MAX_ENTRIES", 1000)
+        super().__init__({**params, "OPTIONS": options})
+        self._local = LocMemCache(
+            f"two-tier-{location}",
+            {
+                "TIMEOUT": self._local_timeout,
+                "OPTIONS": {"MAX_ENTRIES": local_max_entries},
+            },
+        )
+
+    @property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _is_local(self, key):
+        return not key.startswith(self._shared_only)
+
+    def _local_timeout_for(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._shared.add(key, value, timeout, version)
+        if added and self._is_local(key):
+            self._local.set(
+                key, value, self._local_timeout_for(timeout), version
+            )
+        return added
+
+    def get(self, key, default=None, version=None):
+        if not self._is_local(key):
+            return self._shared.get(key, default, version)
+        missing = object()
+        value = self._local.get(key, missing, version)
+        if value is not missing:
+            return value
+        value = self._shared.get(key, missing, version)
+        if value is missing:
+            return default
+        self._local.set(key, value, self._local_timeout, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            if self._is_local(key):
+                missing = object()
+                value = self._local.get(key, missing, version)
+                if value is not missing:
+                    found[key] = value
+                    continue
+            remote.append(key)
+        if remote:
+            fetched = self._shared.get_many(remote, version)
+            for key, value in fetched.items():
+                if self._is_local(key):
+                    self._local.set(key, value, self._local_timeout, version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._shared.set(key, value, timeout, version)
+        if self._is_local(key):
+            self._local.set(
+                key, value, self._local_timeout_for(timeout), version
+            )
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version)
+        self._shared.delete(key, version)
+
+    def has_key(self, key, version=None):
+        if self._is_local(key) and self._local.has_key(key, version):
+            return True
+        return self._shared.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local.delete(key, version)
+        return self._shared.incr(key, delta, version)
+
+    def clear(self):
+        self._local.clear()
+        self._shared.clear()
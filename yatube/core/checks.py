@@ -0,0 +1,44 @@
+"""Проверки настроек, выполняемые при запуске."""
+from django.conf import settings
+from django.core.checks import Error, register
+
+DEBUG_APPS = ("debug_toolbar",)
+DEBUG_MIDDLEWARE = ("debug_toolbar.middleware.DebugToolbarMiddleware",)
+
+
+@register
+def debug_tooling(app_configs=None, **kwargs):
+    """В профиле production не должно быть отладочных инструментов: они
+    запоминают каждый SQL-запрос и стек вызовов в памяти."""
+    if not settings.PRODUCTION:
+        return []
+    errors = []
+    if settings.DEBUG:
+        errors.append(
+            Error("DEBUG включён в профиле production", id="core.E001")
+        )
+    for app in DEBUG_APPS:
+        if app in settings.INSTALLED_APPS:
+            errors.append(
+                Error(
+                    f"{app} в INSTALLED_APPS профиля production",
+                    id="core.E002",
+                )
+            )
+    for middleware in DEBUG_MIDDLEWARE:
+        if middleware in settings.MIDDLEWARE:
+            errors.append(
+                Error(
+                    f"{middleware} в MIDDLEWARE профиля production",
+                    id="core.E003",
+                )
+            )
+    for template in settings.TEMPLATES:
+        if template.get("OPTIONS", {}).get("debug"):
+            errors.append(
+                Error(
+                    "Отладка шаблонов включена в профиле production",
+                    id="core.E004",
+                )
+            )
+    return errors
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def live_updates(request):
+    """Подключать ли на страницах живые обновления (см. posts.live)."""
+    return {"live_updates": settings.LIVE_UPDATES}
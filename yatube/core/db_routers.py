@@ -0,0 +1,61 @@
+"""Чтение с реплик, запись в основную базу.
+
+С реплик читают только представления, которым это разрешил
+ReplicaRoutingMiddleware; всё остальное (команды, фоновые потоки, код вне
+запроса) работает с основной базой. После первой записи в запросе все
+чтения до его конца тоже идут в основную базу.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = "default"
+
+_state = threading.local()
+
+
+def use_replica():
+    """Разрешает чтение с реплики до конца текущего запроса."""
+    if settings.DATABASE_REPLICAS:
+        _state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+
+def reset():
+    _state.replica = None
+    _state.wrote = False
+
+
+def wrote():
+    """Была ли в текущем запросе запись в базу."""
+    return getattr(_state, "wrote", False)
+
+
+def reading_from_replica():
+    return getattr(_state, "replica", None) is not None and not wrote()
+
+
+def primary_only(view):
+    """Представление читает только из основной базы (например, потому что
+    сразу после чтения пишет)."""
+    view.primary_only = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return _state.replica
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        return db == PRIMARY
@@ -0,0 +1,102 @@
+"""Шина событий для живых обновлений страниц (server-sent events).
+
+Код, который пишет в базу, публикует события в каналы (строки вида
+"group:3") функцией publish(); потоки SSE, которые отдаёт ASGI-приложение,
+подписываются на каналы и получают события из очереди в своём цикле
+событий.
+
+LocalBroker доставляет события внутри процесса и подходит, пока сайт
+работает одним процессом. Для нескольких процессов или серверов нужен
+брокер с общей шиной (например, Redis pub/sub): подкласс Broker с
+методами publish и subscribe, путь к которому задаёт EVENTS_BROKER.
+"""
+import asyncio
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """Очередь событий одного подписчика в его цикле событий.
+
+    put() можно вызывать из любого потока. Если подписчик не успевает
+    читать, новые события отбрасываются, а lost растёт: клиенту достаточно
+    знать, что страница устарела.
+    """
+
+    def __init__(self, broker, channels, size):
+        self.broker = broker
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=size)
+        self.lost = 0
+
+    def _put(self, channel, event):
+        try:
+            self.queue.put_nowait((channel, event))
+        except asyncio.QueueFull:
+            self.lost += 1
+
+    def put(self, channel, event):
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._put, channel, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def publish(self, channel, event):
+        raise NotImplementedError
+
+    def subscribe(self, channels):
+        """Подписка на каналы; вызывается из цикла событий подписчика."""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+
+class LocalBroker(Broker):
+    """Брокер в памяти процесса."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def publish(self, channel, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(channel, event)
+        return len(subscribers)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, settings.EVENTS_QUEUE_SIZE)
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                subscribers = self.subscribers.get(channel, set())
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self.subscribers.pop(channel, None)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+def publish(channel, event):
+    return get_broker().publish(channel, event)
@@ -0,0 +1,68 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет фоновые задачи из очереди (core.tasks); SIGTERM и Ctrl+C "
+        "останавливают исполнитель после текущей пачки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить доступные задачи и завершиться",
+        )
+        parser.add_argument(
+            "--name",
+            action="append",
+            dest="names",
+            help="Выполнять только задачи этого вида (можно повторять)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.TASKS_POLL_INTERVAL,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+
+    def handle(self, *args, **options):
+        worker = tasks.Worker(options["names"])
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        previous = {
+            signum: signal.signal(signum, stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            done = self.work(worker, options)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}"))
+
+    def work(self, worker, options):
+        done = 0
+        while not self.stopping:
+            try:
+                processed = worker.run_once()
+            finally:
+                # Исполнитель живёт долго: соединение с базой
+                # проверяется так же, как после каждого запроса.
+                close_old_connections()
+            done += processed
+            if not processed:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+        return done
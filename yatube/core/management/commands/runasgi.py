@@ -0,0 +1,37 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import asgi
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает yatube.asgi на встроенном сервере asyncio (для разработки "
+        "и замеров; в бою -- uvicorn, daphne или hypercorn)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "addrport", nargs="?", default="127.0.0.1:8000", help="Адрес:порт"
+        )
+
+    def handle(self, *args, **options):
+        host, _, port = options["addrport"].rpartition(":")
+        if not port.isdigit():
+            raise CommandError(f"Неверный адрес: {options['addrport']}")
+        from yatube.asgi import application
+
+        def started(server):
+            self.stdout.write(
+                f"Сервер ASGI: http://{host or '127.0.0.1'}:{port}/"
+            )
+
+        try:
+            asyncio.run(
+                asgi.serve(
+                    application, host or "127.0.0.1", int(port), started
+                )
+            )
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import sqlite
+
+PROFILES = (
+    ("по умолчанию", {}, False),
+    ("SQLITE_TUNING=1", settings.SQLITE_PRAGMAS, True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность SQLite при одновременных "
+        "чтениях и записях с настройками по умолчанию и с SQLITE_TUNING"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads", type=int, default=8, help="Число потоков"
+        )
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=5,
+            help="Длительность замера каждого профиля",
+        )
+        parser.add_argument(
+            "--write-ratio",
+            type=float,
+            default=0.2,
+            help="Доля записей среди операций",
+        )
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=10000,
+            help="Сколько комментариев в базе до начала замера",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'Профиль':<18}{'чтений/с':>12}{'записей/с':>12}"
+            f"{'блокировок':>12}"
+        )
+        for name, pragmas, persistent in PROFILES:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "benchmark.sqlite3")
+                sqlite.prepare(path, rows=options["rows"])
+                result = sqlite.benchmark(
+                    path,
+                    pragmas,
+                    persistent,
+                    threads=options["threads"],
+                    seconds=options["seconds"],
+                    write_ratio=options["write_ratio"],
+                )
+            self.stdout.write(
+                f"{name:<18}{result['reads']:>12.0f}"
+                f"{result['writes']:>12.0f}{result['locked']:>12}"
+            )
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает и разбирает все шаблоны; завершается ошибкой, если "
+        "какой-то шаблон не разбирается"
+    )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        loaded, errors = warmup.warm_up()
+        elapsed = time.monotonic() - started
+        for name, error in errors:
+            self.stderr.write(f"{name}: {error}")
+        if errors:
+            raise CommandError(f"Шаблонов с ошибками: {len(errors)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено шаблонов: {loaded} за {elapsed:.2f} с"
+            )
+        )
@@ -0,0 +1,290 @@
+"""Метрики запросов: время ответа, работы с базой и шаблонами, кэш.
+
+RequestMetricsMiddleware собирает для каждого запроса RequestMetrics:
+время запросов к базе (execute_wrapper на всех соединениях), время
+отрисовки шаблонов (бэкенд core.template_backends) и попадания в кэш
+(обёртки get и get_many экземпляров кэшей, см. instrument_cache()).
+Итог попадает в гистограммы REGISTRY, которые отдаёт представление
+core.views.metrics в текстовом формате Prometheus.
+Гистограммы свои у каждого процесса.
+"""
+import functools
+import threading
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = threading.local()
+_MISSING = object()
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self.lock:
+            counts, total = self.series.get(labels, (None, 0.0))
+            if counts is None:
+                counts = [0] * (len(self.buckets) + 1)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self.series[labels] = counts, total + value
+
+    def _labels(self, values, extra=""):
+        pairs = [
+            f'{name}="{value}"' for name, value in zip(self.labels, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+        for values, (counts, total) in series:
+            for bound, count in zip(self.buckets, counts):
+                labels = self._labels(values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self._labels(values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {counts[-1]}")
+            lines.append(f"{self.name}_sum{self._labels(values)} {total}")
+            lines.append(
+                f"{self.name}_count{self._labels(values)} {counts[-1]}"
+            )
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount, *labels):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self.lock:
+            series = sorted(self.series.items())
+        for values, count in series:
+            labels = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.labels, values)
+            )
+            lines.append(f"{self.name}{{{labels}}} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "yatube_request_duration_seconds",
+    "Время ответа",
+    ("view", "method", "status"),
+    DURATION_BUCKETS,
+)
+DB_SECONDS = Histogram(
+    "yatube_db_duration_seconds",
+    "Время запросов к базе за один ответ",
+    ("view",),
+    DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "yatube_db_queries",
+    "Число запросов к базе за один ответ",
+    ("view",),
+    COUNT_BUCKETS,
+)
+TEMPLATE_SECONDS = Histogram(
+    "yatube_template_duration_seconds",
+    "Время отрисовки шаблонов за один ответ",
+    ("view",),
+    DURATION_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    "yatube_cache_lookups_total",
+    "Чтения из кэша",
+    ("view", "result"),
+)
+REGISTRY = (
+    REQUEST_SECONDS,
+    DB_SECONDS,
+    DB_QUERIES,
+    TEMPLATE_SECONDS,
+    CACHE_LOOKUPS,
+)
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Показатели одного запроса; sql заполняется, если keep_sql."""
+
+    def __init__(self, keep_sql=False):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.keep_sql = keep_sql
+        self.sql = []
+        # Виды измеряемых вызовов, которые выполняются прямо сейчас.
+        self.active = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper для соединений с базой."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_seconds += elapsed
+            self.queries += 1
+            if self.keep_sql:
+                self.sql.append((elapsed, sql, params))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        return ", ".join(
+            (
+                f"total;dur={total * 1000:.1f}",
+                f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} '
+                f'queries"',
+                f"tpl;dur={self.template_seconds * 1000:.1f}",
+                f'cache;desc="hit={self.cache_hits} '
+                f'miss={self.cache_misses}"',
+            )
+        )
+
+    def record(self, view, method, status, total):
+        REQUEST_SECONDS.observe(total, view, method, status)
+        DB_SECONDS.observe(self.db_seconds, view)
+        DB_QUERIES.observe(self.queries, view)
+        TEMPLATE_SECONDS.observe(self.template_seconds, view)
+        if self.cache_hits:
+            CACHE_LOOKUPS.inc(self.cache_hits, view, "hit")
+        if self.cache_misses:
+            CACHE_LOOKUPS.inc(self.cache_misses, view, "miss")
+
+
+def start(keep_sql=False):
+    _current.metrics = RequestMetrics(keep_sql)
+    return _current.metrics
+
+
+def stop():
+    _current.metrics = None
+
+
+def current():
+    return getattr(_current, "metrics", None)
+
+
+def _measured(kind, function, on_done):
+    """Обёртка, передающая результат и время вызова в on_done. Вложенные
+    вызовы того же вида (include шаблона, уровни двухуровневого кэша) не
+    учитываются повторно."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        metrics = current()
+        if metrics is None or kind in metrics.active:
+            return function(*args, **kwargs)
+        metrics.active.add(kind)
+        started = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            metrics.active.discard(kind)
+        on_done(metrics, time.perf_counter() - started, result)
+        return result
+
+    return wrapper
+
+
+def _add_template_time(metrics, elapsed, result):
+    metrics.template_seconds += elapsed
+
+
+def measured_template(render):
+    """Обёртка для Template.render бэкенда шаблонов."""
+    return _measured("template", render, _add_template_time)
+
+
+def _count_cache_lookup(metrics, elapsed, result):
+    if result is _MISSING:
+        metrics.cache_misses += 1
+    else:
+        metrics.cache_hits += 1
+
+
+def _count_cache_lookups(metrics, elapsed, result):
+    values, requested = result
+    metrics.cache_hits += len(values)
+    metrics.cache_misses += requested - len(values)
+
+
+def _counted_get(get):
+    measured = _measured(
+        "cache",
+        lambda key, version: get(key, _MISSING, version),
+        _count_cache_lookup,
+    )
+
+    @functools.wraps(get)
+    def wrapper(key, default=None, version=None):
+        value = measured(key, version)
+        return default if value is _MISSING else value
+
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    measured = _measured(
+        "cache",
+        lambda keys, version: (get_many(keys, version=version), len(keys)),
+        _count_cache_lookups,
+    )
+
+    @functools.wraps(get_many)
+    def wrapper(keys, version=None):
+        values, requested = measured(list(keys), version)
+        return values
+
+    return wrapper
+
+
+def instrument_cache(cache):
+    """Оборачивает get и get_many экземпляра кэша (у каждого потока свой,
+    см. django.core.cache.caches); сам класс бэкенда не меняется."""
+    if getattr(cache, "instrumented", False):
+        return
+    cache.get = _counted_get(cache.get)
+    cache.get_many = _counted_get_many(cache.get_many)
+    cache.instrumented = True
@@ -0,0 +1,103 @@
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from core import db_routers, metrics
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+METHODS = SAFE_METHODS + ("POST", "PUT", "PATCH", "DELETE")
+
+slow_requests = logging.getLogger("yatube.slow_requests")
+
+
+class RequestMetricsMiddleware:
+    """Время ответа, работы с базой, шаблонами и кэшем для каждого запроса.
+
+    Показатели уходят в гистограммы core.metrics и заголовок
+    Server-Timing. Доля SLOW_REQUEST_SAMPLE_RATE запросов запоминает свой
+    SQL и, если ответ занял больше SLOW_REQUEST_SECONDS, попадает в журнал
+    yatube.slow_requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for alias in settings.CACHES:
+            metrics.instrument_cache(caches[alias])
+        sampled = random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+        current = metrics.start(keep_sql=sampled)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(current))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total = current.elapsed()
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        method = request.method if request.method in METHODS else "other"
+        current.record(view, method, response.status_code, total)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = current.server_timing(total)
+        if sampled and total >= settings.SLOW_REQUEST_SECONDS:
+            self.log_slow_request(request, current, total)
+        return response
+
+    def log_slow_request(self, request, current, total):
+        lines = [
+            f"{request.method} {request.get_full_path()}: "
+            f"{total * 1000:.0f} мс, {current.queries} запросов к базе "
+            f"за {current.db_seconds * 1000:.0f} мс, шаблоны "
+            f"{current.template_seconds * 1000:.0f} мс"
+        ]
+        for elapsed, sql, params in sorted(
+            current.sql, key=lambda query: query[0], reverse=True
+        ):
+            lines.append(f"  {elapsed * 1000:.1f} мс: {sql} {params!r}")
+        slow_requests.warning("\n".join(lines))
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает представлениям из REPLICA_VIEW_MODULES читать с реплик.
+
+    Пользователь, который только что что-то записал, ещё
+    REPLICA_STICKY_SECONDS секунд читает из основной базы (по cookie),
+    чтобы видеть свои изменения, даже если реплика отстаёт.
+    """
+
+    COOKIE = "db_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_routers.reset()
+        try:
+            response = self.get_response(request)
+            wrote = db_routers.wrote()
+        finally:
+            db_routers.reset()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                self.COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and view_func.__module__ in settings.REPLICA_VIEW_MODULES
+            and not getattr(view_func, "primary_only", False)
+            and self.COOKIE not in request.COOKIES
+        ):
+            db_routers.use_replica()
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:36
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Вид')),
+                ('key', models.CharField(blank=True, default='', max_length=255, verbose_name='Ключ')),
+                ('payload', models.TextField(default='{}', verbose_name='Параметры')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Выполнить после')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Занята до')),
+                ('owner', models.CharField(blank=True, max_length=32, verbose_name='Исполнитель')),
+                ('dead', models.BooleanField(default=False, verbose_name='Не выполнена')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+            ],
+            options={
+                'verbose_name': 'фоновую задачу',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ('run_after', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['dead', 'run_after', 'id'], name='task_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['name', 'key'], name='task_key_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Фоновая задача в очереди (см. core.tasks)."""
+
+    name = models.CharField("Вид", max_length=100)
+    # Пока в очереди есть задача того же вида с тем же ключом, новая не
+    # ставится.
+    key = models.CharField("Ключ", max_length=255, blank=True, default="")
+    payload = models.TextField("Параметры", default="{}")
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    run_after = models.DateTimeField("Выполнить после", default=timezone.now)
+    locked_until = models.DateTimeField("Занята до", null=True, blank=True)
+    owner = models.CharField("Исполнитель", max_length=32, blank=True)
+    dead = models.BooleanField("Не выполнена", default=False)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+    created = models.DateTimeField("Создана", auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}"
+
+    class Meta:
+        ordering = ("run_after", "id")
+        indexes = [
+            models.Index(
+                fields=["dead", "run_after", "id"], name="task_queue_idx"
+            ),
+            models.Index(fields=["name", "key"], name="task_key_idx"),
+        ]
+        verbose_name = "фоновую задачу"
+        verbose_name_plural = "Фоновые задачи"
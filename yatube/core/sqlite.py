@@ -0,0 +1,138 @@
+"""Настройка соединений SQLite под нагрузкой.
+
+При SQLITE_TUNING=1 каждое новое соединение Django получает PRAGMA из
+SQLITE_PRAGMAS: журнал WAL (читатели не ждут писателя, писатель не ждёт
+читателей), synchronous=NORMAL (fsync только при контрольной точке WAL),
+кэш страниц и mmap побольше и ожидание блокировки вместо немедленной
+ошибки «database is locked».
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+
+
+def statements(pragmas):
+    return [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+
+def tune(cursor, pragmas):
+    for sql in statements(pragmas):
+        cursor.execute(sql)
+
+
+def tune_connection(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != "sqlite" or not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        tune(cursor, settings.SQLITE_PRAGMAS)
+
+
+# Нагрузка для sqlite_benchmark: комментарии к постам, как в add_comment
+# и post_detail.
+SCHEMA = (
+    "CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, "
+    "author_id INTEGER, text TEXT, created REAL)",
+    "CREATE INDEX comment_post_created ON comment (post_id, created, id)",
+)
+INSERT = (
+    "INSERT INTO comment (post_id, author_id, text, created) "
+    "VALUES (?, ?, ?, ?)"
+)
+SELECT = (
+    "SELECT id, author_id, text, created FROM comment "
+    "WHERE post_id = ? ORDER BY created, id LIMIT 20"
+)
+
+
+def _connect(path, pragmas):
+    # Соединение открывается так же, как его открывает Django: с
+    # регистрацией функций бэкенда, -- это и есть цена CONN_MAX_AGE=0.
+    wrapper = DatabaseWrapper(
+        {**connections["default"].settings_dict, "NAME": path}
+    )
+    raw = wrapper.get_new_connection(wrapper.get_connection_params())
+    raw.isolation_level = None
+    tune(raw, pragmas)
+    return raw
+
+
+def prepare(path, rows=10000, posts=100):
+    """Создаёт файл базы для замера и заполняет его комментариями."""
+    with sqlite3.connect(path) as raw:
+        for sql in SCHEMA:
+            raw.execute(sql)
+        raw.executemany(
+            INSERT,
+            (
+                (number % posts + 1, number % 50, "Комментарий", number)
+                for number in range(rows)
+            ),
+        )
+    raw.close()
+
+
+def _worker(path, pragmas, persistent, deadline, write_ratio, posts, totals):
+    rng = random.Random()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    raw = None
+    while time.monotonic() < deadline:
+        if raw is None:
+            raw = _connect(path, pragmas)
+        post_id = rng.randint(1, posts)
+        try:
+            if rng.random() < write_ratio:
+                raw.execute(INSERT, (post_id, 1, "Комментарий", time.time()))
+                counts["writes"] += 1
+            else:
+                raw.execute(SELECT, (post_id,)).fetchall()
+                counts["reads"] += 1
+        except sqlite3.OperationalError:
+            counts["locked"] += 1
+        if not persistent:
+            raw.close()
+            raw = None
+    if raw is not None:
+        raw.close()
+    totals.append(counts)
+
+
+def benchmark(
+    path,
+    pragmas,
+    persistent,
+    threads=8,
+    seconds=5.0,
+    write_ratio=0.2,
+    posts=100,
+):
+    """Гоняет смесь чтений и записей из threads потоков; возвращает число
+    операций каждого вида в секунду и число ошибок блокировки."""
+    totals = []
+    deadline = time.monotonic() + seconds
+    workers = [
+        threading.Thread(
+            target=_worker,
+            args=(path, pragmas, persistent, deadline, write_ratio, posts),
+            kwargs={"totals": totals},
+        )
+        for _ in range(threads)
+    ]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+    result = {"reads": 0, "writes": 0, "locked": 0}
+    for counts in totals:
+        for name, value in counts.items():
+            result[name] += value
+    result["reads"] /= elapsed
+    result["writes"] /= elapsed
+    return result
@@ -0,0 +1,198 @@
+"""Очередь фоновых задач в таблице базы данных.
+
+Побочные действия записи, которые не нужны для ответа (раскладка по
+лентам подписок, поисковый индекс, миниатюры), ставятся в очередь
+функцией enqueue(), а выполняет их процесс manage.py run_worker. Задача
+пишется в ту же базу, что и данные. Представления записи, API пачек и
+админка работают в transaction.atomic, поэтому там задача фиксируется
+вместе с данными: при откате пропадает и она, а исполнитель не увидит
+задачу раньше данных. Вне транзакции (ATOMIC_REQUESTS выключен, например
+shell) данные фиксируются раньше задачи, и при сбое между ними задача
+теряется.
+
+Обработчик регистрируется декоратором @task("вид", batch_size=...) и
+получает список параметров: исполнитель забирает до batch_size задач
+одного вида за раз. Забранные задачи скрыты от других исполнителей
+TASKS_VISIBILITY_TIMEOUT секунд; если исполнитель упал, они снова
+становятся доступны, поэтому обработчики должны выдерживать повторный
+запуск. При ошибке пачка повторяется через TASKS_RETRY_DELAY *
+2 ** (попытка - 1) секунд, но не позже TASKS_RETRY_MAX_DELAY; после
+max_attempts попыток задача остаётся в таблице с dead=True.
+
+При TASKS_EAGER (разработка и тесты) задачи выполняются сразу при
+постановке; ошибка задачи, как и у исполнителя, попадает в журнал и не
+прерывает запрос, который её поставил.
+"""
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Task
+
+logger = logging.getLogger("yatube.tasks")
+
+REGISTRY = {}
+
+
+class TaskType:
+    def __init__(self, name, function, batch_size, max_attempts):
+        self.name = name
+        self.function = function
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts or settings.TASKS_MAX_ATTEMPTS
+
+
+def task(name, batch_size=1, max_attempts=None):
+    """Регистрирует обработчик задач вида name."""
+
+    def decorator(function):
+        REGISTRY[name] = TaskType(name, function, batch_size, max_attempts)
+        return function
+
+    return decorator
+
+
+def _task_type(name):
+    if name not in REGISTRY:
+        raise ValueError(f"Неизвестный вид задачи: {name}")
+    return REGISTRY[name]
+
+
+def _dump(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True)
+
+
+def _run_eagerly(task_type, payloads):
+    try:
+        # Точка сохранения: ошибка базы в задаче не ломает транзакцию
+        # запроса.
+        with transaction.atomic():
+            task_type.function(payloads)
+    except Exception:
+        logger.exception(
+            "Задачи %s не выполнены (%s шт.)", task_type.name, len(payloads)
+        )
+
+
+def enqueue(name, key="", **payload):
+    """Ставит задачу в очередь; с key -- если такой ещё нет в очереди."""
+    task_type = _task_type(name)
+    if settings.TASKS_EAGER:
+        _run_eagerly(task_type, [payload])
+        return None
+    # Забранная исполнителем задача могла уже прочитать данные, которые
+    # изменились после этого, поэтому совпадать может только ждущая.
+    pending = Task.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lte=timezone.now()),
+        name=name,
+        key=key,
+        dead=False,
+        owner="",
+    )
+    if key and pending.exists():
+        return None
+    return Task.objects.create(name=name, key=key, payload=_dump(payload))
+
+
+def enqueue_many(name, payloads):
+    """Ставит в очередь пачку задач одного вида одним запросом."""
+    task_type = _task_type(name)
+    payloads = list(payloads)
+    if not payloads:
+        return
+    if settings.TASKS_EAGER:
+        _run_eagerly(task_type, payloads)
+        return
+    Task.objects.bulk_create(
+        Task(name=name, payload=_dump(payload)) for payload in payloads
+    )
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой после attempts неудачных."""
+    delay = settings.TASKS_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.TASKS_RETRY_MAX_DELAY))
+
+
+class Worker:
+    """Исполнитель: забирает и выполняет пачки задач."""
+
+    def __init__(self, names=None):
+        self.names = names
+        self.owner = uuid.uuid4().hex
+
+    def visible(self, now):
+        tasks = Task.objects.filter(dead=False, run_after__lte=now).filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+        )
+        if self.names:
+            tasks = tasks.filter(name__in=self.names)
+        return tasks
+
+    def claim(self):
+        """Забирает пачку задач вида самой старой доступной задачи."""
+        now = timezone.now()
+        visible = self.visible(now).order_by("run_after", "id")
+        name = visible.values_list("name", flat=True).first()
+        if name is None:
+            return None, []
+        task_type = REGISTRY.get(name)
+        batch_size = task_type.batch_size if task_type else 1
+        ids = list(
+            visible.filter(name=name).values_list("id", flat=True)[:batch_size]
+        )
+        locked_until = now + timedelta(
+            seconds=settings.TASKS_VISIBILITY_TIMEOUT
+        )
+        # Условие видимости повторяется в UPDATE: если ту же задачу успел
+        # забрать другой исполнитель, она не обновится.
+        self.visible(now).filter(pk__in=ids).update(
+            owner=self.owner,
+            locked_until=locked_until,
+            attempts=F("attempts") + 1,
+        )
+        claimed = list(
+            Task.objects.filter(
+                pk__in=ids, owner=self.owner, locked_until=locked_until
+            )
+        )
+        return task_type, claimed
+
+    def fail(self, task_type, claimed, error):
+        now = timezone.now()
+        for item in claimed:
+            fields = {"locked_until": None, "owner": "", "last_error": error}
+            if task_type is None or item.attempts >= task_type.max_attempts:
+                fields["dead"] = True
+            else:
+                fields["run_after"] = now + backoff(item.attempts)
+            Task.objects.filter(pk=item.pk, owner=self.owner).update(**fields)
+
+    def run_once(self):
+        """Выполняет одну пачку задач; возвращает её размер."""
+        task_type, claimed = self.claim()
+        if not claimed:
+            return 0
+        if task_type is None:
+            self.fail(None, claimed, "Нет обработчика")
+            return len(claimed)
+        try:
+            task_type.function([json.loads(item.payload) for item in claimed])
+        except Exception:
+            logger.exception(
+                "Задачи %s не выполнены (%s шт.)", task_type.name, len(claimed)
+            )
+            self.fail(task_type, claimed, traceback.format_exc())
+        else:
+            Task.objects.filter(
+                pk__in=[item.pk for item in claimed], owner=self.owner
+            ).delete()
+        return len(claimed)
@@ -0,0 +1,21 @@
+"""Бэкенд шаблонов Django, который учитывает время отрисовки в метриках
+запроса (core.metrics)."""
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from core import metrics
+
+
+class Template(django_backend.Template):
+    render = metrics.measured_template(django_backend.Template.render)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -2,7 +2,25 @@ from django import template
 
 register = template.Library()
 
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 3
+
+# Словарь атрибутов для каждого класса создаётся один раз: as_widget
+# копирует переданные атрибуты, а не изменяет их.
+_class_attrs = {}
+
 
 @register.filter
 def addclass(field, css):
-    return field.as_widget(attrs={'class': css})
+    attrs = _class_attrs.get(css)
+    if attrs is None:
+        attrs = _class_attrs[css] = {"class": css}
+    return field.as_widget(attrs=attrs)
+
+
+@register.filter
+def page_window(page, size=PAGE_WINDOW):
+    """Номера страниц вокруг текущей вместо всех страниц ленты."""
+    first = max(page.number - size, 1)
+    last = min(page.number + size, page.paginator.num_pages)
+    return range(first, last + 1)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TransactionTestCase
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from posts import benchmark
+from posts.api_writes import issue_token
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ASGIHandlerTests(TransactionTestCase):
+    """Запросы обрабатываются в потоках пула, поэтому данные должны быть
+    видны другим соединениям с базой."""
+
+    def setUp(self):
+        self.handler = ASGIHandler(threads=2)
+        self.author = User.objects.create_user(
+            username="asgi-author", is_staff=True
+        )
+        Post.objects.create(author=self.author, text="Пост через ASGI")
+
+    def tearDown(self):
+        self.handler.executor.shutdown(wait=True)
+
+    def request(self, method, path, body=b"", headers=()):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": query.encode(),
+            "headers": [(b"host", b"testserver"), *headers],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 5000),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": body}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        start, *chunks = messages
+        content = b"".join(chunk.get("body", b"") for chunk in chunks)
+        return start["status"], dict(start["headers"]), content
+
+    def test_get_and_post(self):
+        status, _, content = self.request("GET", "/")
+        self.assertEqual(status, 200)
+        self.assertIn("Пост через ASGI", content.decode())
+        token = issue_token(self.author)
+        status, headers, content = self.request(
+            "POST",
+            "/api/v1/posts/",
+            json.dumps({"posts": [{"text": "Из тела запроса"}]}).encode(),
+            [
+                (b"content-type", b"application/json"),
+                (b"authorization", f"Token {token}".encode()),
+            ],
+        )
+        self.assertEqual(status, 201, content)
+        self.assertEqual(headers[b"Content-Type"], b"application/json")
+        self.assertTrue(Post.objects.filter(text="Из тела запроса").exists())
+
+    def test_streaming_response_and_cookies(self):
+        client = Client()
+        client.force_login(self.author)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session}".encode()
+        status, _, content = self.request(
+            "GET", "/export/?type=post", headers=[(b"cookie", cookie)]
+        )
+        self.assertEqual(status, 200)
+        self.assertIn("Пост через ASGI", content.decode())
+        status, headers, _ = self.request("GET", "/auth/login/")
+        self.assertIn(b"csrftoken=", headers[b"Set-Cookie"])
+
+    def test_slow_clients_do_not_hold_threads(self):
+        """Медленные клиенты не занимают единственный поток пула"""
+        with benchmark.ASGIServer(workers=1) as server:
+            with benchmark.SlowClients(server.address, 3, interval=0.1):
+                with urllib.request.urlopen(
+                    server.url + reverse("about:author"), timeout=5
+                ) as response:
+                    self.assertEqual(response.status, 200)
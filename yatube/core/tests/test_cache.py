@@ -0,0 +1,95 @@
+import os
+import runpy
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from core.cache_backends import SQLiteCache
+
+
+class SharedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.cache_dir = tempfile.mkdtemp()
+        cls.location = os.path.join(cls.cache_dir, "cache.sqlite3")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    def test_sqlite_cache_is_shared_between_instances(self):
+        """Значения SQLite-кэша видны другому экземпляру (процессу)"""
+        writer = SQLiteCache(self.location, {})
+        reader = SQLiteCache(self.location, {})
+        writer.set("key", {"value": 1})
+        self.assertEqual(reader.get("key"), {"value": 1})
+        self.assertFalse(reader.add("key", "other"))
+        writer.set("counter", 1)
+        self.assertEqual(reader.incr("counter"), 2)
+        self.assertEqual(writer.get("counter"), 2)
+        writer.delete("key")
+        self.assertIsNone(reader.get("key"))
+        with self.assertRaises(ValueError):
+            reader.incr("missing")
+
+    def test_sqlite_cache_expires_values(self):
+        """Просроченные значения не возвращаются и не мешают add"""
+        cache = SQLiteCache(self.location, {})
+        cache.set("short", "value", timeout=-1)
+        self.assertIsNone(cache.get("short"))
+        self.assertTrue(cache.add("short", "new"))
+        self.assertEqual(cache.get("short"), "new")
+
+    def test_sqlite_cache_keeps_none(self):
+        """Сохранённый None отличается от отсутствующего ключа"""
+        cache = SQLiteCache(self.location, {})
+        cache.set("empty", None)
+        self.assertIsNone(cache.get("empty", "default"))
+        self.assertTrue(cache.has_key("empty"))
+        self.assertEqual(cache.get("missing", "default"), "default")
+
+    def test_redis_backend_requires_django_redis(self):
+        """Без django-redis CACHE_BACKEND=redis не подменяется локальным
+        кэшем, а останавливает запуск"""
+        path = os.path.join(settings.BASE_DIR, "yatube", "settings.py")
+        with mock.patch.dict(os.environ, {"CACHE_BACKEND": "redis"}):
+            with mock.patch("importlib.util.find_spec", return_value=None):
+                with self.assertRaisesMessage(
+                    ImproperlyConfigured, "django-redis"
+                ):
+                    runpy.run_path(path)
+
+    def test_two_tier_cache_reads_versions_from_shared_tier(self):
+        """Счётчики версий всегда читаются из общего кэша, остальные
+        значения -- из локального, пока не истечёт LOCAL_TIMEOUT"""
+        two_tier = {
+            "default": {
+                "BACKEND": "core.cache_backends.TwoTierCache",
+                "LOCATION": "test",
+                "OPTIONS": {"SHARED": "shared", "LOCAL_TIMEOUT": 60},
+            },
+            "shared": {
+                "BACKEND": "core.cache_backends.SQLiteCache",
+                "LOCATION": self.location,
+            },
+        }
+        with override_settings(CACHES=two_tier):
+            cache = caches["default"]
+            shared = caches["shared"]
+            cache.set("fragment", "cached")
+            cache.set("feed-version:index", 1)
+            shared.set("fragment", "changed elsewhere")
+            shared.incr("feed-version:index")
+            self.assertEqual(cache.get("fragment"), "cached")
+            self.assertEqual(cache.get("feed-version:index"), 2)
+            self.assertEqual(
+                cache.get_many(["fragment", "feed-version:index"]),
+                {"fragment": "cached", "feed-version:index": 2},
+            )
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import views as core_views
+from core.middleware import ReplicaRoutingMiddleware
+from posts import views as posts_views
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"])
+class ReplicaRoutingTests(TestCase):
+    def route(self, view, method="GET", cookies=None, write=False):
+        """Базы, из которых читает view до и после записи."""
+        reads = []
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            reads.append(router.db_for_read(Post))
+            if write:
+                router.db_for_write(Post)
+                reads.append(router.db_for_read(Post))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        request = RequestFactory().generic(method, "/")
+        request.COOKIES.update(cookies or {})
+        return reads, middleware(request)
+
+    def test_feed_views_read_from_replica(self):
+        """Ленты читают с реплики, пока в запросе не было записи"""
+        reads, response = self.route(posts_views.index)
+        self.assertEqual(reads, ["replica1"])
+        self.assertNotIn("db_primary", response.cookies)
+        self.assertEqual(router.db_for_read(Post), "default")
+
+    def test_write_pins_request_and_user_to_primary(self):
+        """После записи чтения идут в основную базу, пользователь получает
+        cookie, которая на время оставляет его на основной базе"""
+        reads, response = self.route(posts_views.profile, write=True)
+        self.assertEqual(reads, ["replica1", "default"])
+        self.assertIn("db_primary", response.cookies)
+        reads, _ = self.route(posts_views.index, cookies={"db_primary": "1"})
+        self.assertEqual(reads, ["default"])
+
+    def test_other_requests_use_primary(self):
+        """Запросы на запись, представления, которые пишут, и
+        представления других приложений читают из основной базы"""
+        cases = [
+            (posts_views.index, "POST"),
+            (posts_views.post_create, "GET"),
+            (posts_views.profile_follow, "GET"),
+            (core_views.page_not_found, "GET"),
+        ]
+        for view, method in cases:
+            with self.subTest(view=view.__name__, method=method):
+                reads, _ = self.route(view, method)
+                self.assertEqual(reads, ["default"])
+
+    def test_router_allows_migrations_on_primary_only(self):
+        self.assertTrue(router.allow_migrate("default", "posts"))
+        self.assertFalse(router.allow_migrate("replica1", "posts"))
+
+    @override_settings(DATABASE_REPLICAS=["default"], REPLICA_CACHE_TIMEOUT=7)
+    def test_views_with_replica(self):
+        """Страница с реплики кэшируется ненадолго; подписка оставляет
+        пользователя на основной базе"""
+        author = User.objects.create_user(username="author")
+        reader = User.objects.create_user(username="reader")
+        self.client.force_login(reader)
+        response = self.client.get(reverse("posts:index"))
+        self.assertEqual(response.context["feed_cache_timeout"], 7)
+        response = self.client.get(
+            reverse("posts:profile_follow", args=(author.username,))
+        )
+        self.assertIn("db_primary", response.cookies)
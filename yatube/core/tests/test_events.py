@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+from django.test import TestCase, override_settings
+
+from core import events
+
+
+class EventsTests(TestCase):
+    def test_local_broker_delivers_from_other_threads(self):
+        broker = events.LocalBroker()
+
+        async def scenario():
+            subscription = broker.subscribe(["index", "group:1"])
+            other = broker.subscribe(["group:2"])
+            thread = threading.Thread(
+                target=broker.publish, args=("group:1", {"post": 1})
+            )
+            thread.start()
+            thread.join()
+            received = await asyncio.wait_for(subscription.get(), 1)
+            self.assertTrue(other.queue.empty())
+            subscription.close()
+            other.close()
+            return received
+
+        self.assertEqual(asyncio.run(scenario()), ("group:1", {"post": 1}))
+        self.assertEqual(broker.subscribers, {})
+        self.assertEqual(broker.publish("index", {}), 0)
+
+    @override_settings(EVENTS_QUEUE_SIZE=1)
+    def test_overflow_is_counted(self):
+        broker = events.LocalBroker()
+
+        async def scenario():
+            subscription = broker.subscribe(["index"])
+            for number in range(3):
+                broker.publish("index", {"post": number})
+            await asyncio.sleep(0)
+            return subscription.queue.qsize(), subscription.lost
+
+        self.assertEqual(asyncio.run(scenario()), (1, 2))
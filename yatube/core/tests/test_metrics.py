@@ -0,0 +1,96 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+
+User = get_user_model()
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Server-Timing содержит время базы, шаблонов и попадания в кэш"""
+        self.client.get(reverse("posts:index"))
+        timing = self.client.get(reverse("posts:index"))["Server-Timing"]
+        self.assertRegex(timing, r"^total;dur=[\d.]+, db;dur=[\d.]+;")
+        self.assertIn("tpl;dur=", timing)
+        self.assertRegex(timing, r'cache;desc="hit=[1-9]')
+
+    def test_server_timing_is_off_by_default(self):
+        self.assertNotIn(
+            "Server-Timing", self.client.get(reverse("posts:index"))
+        )
+
+    def test_get_many_is_counted(self):
+        cache = caches["default"]
+        metrics.instrument_cache(cache)
+        cache.set("present", 1)
+        current = metrics.start()
+        try:
+            cache.get_many(["present", "absent", "other"])
+        finally:
+            metrics.stop()
+        self.assertEqual((current.cache_hits, current.cache_misses), (1, 2))
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("posts:index"))
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        content = response.content.decode()
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="posts:index",'
+            'method="GET",status="200",le="+Inf"}',
+            content,
+        )
+        self.assertIn('yatube_db_queries_count{view="posts:index"}', content)
+        for headers in ({}, {"HTTP_AUTHORIZATION": "Bearer wrong"}):
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    self.client.get(reverse("metrics"), **headers).status_code,
+                    HTTPStatus.NOT_FOUND,
+                )
+
+    def test_metrics_endpoint_is_open_to_staff_only(self):
+        user = User.objects.create_user("staff", is_staff=True)
+        self.client.force_login(user)
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code, HTTPStatus.OK
+        )
+        user.is_staff = False
+        user.save()
+        self.assertEqual(
+            self.client.get(reverse("metrics")).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    @override_settings(SLOW_REQUEST_SAMPLE_RATE=1, SLOW_REQUEST_SECONDS=0)
+    def test_sampled_slow_request_is_logged_with_sql(self):
+        with self.assertLogs("yatube.slow_requests") as logs:
+            self.client.get(reverse("posts:index"))
+        self.assertIn("GET /:", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test", "Тест", ("view",), (0.1, 1))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, "index")
+        self.assertEqual(
+            histogram.render()[2:],
+            [
+                'test_bucket{view="index",le="0.1"} 1',
+                'test_bucket{view="index",le="1"} 2',
+                'test_bucket{view="index",le="+Inf"} 3',
+                'test_sum{view="index"} 5.55',
+                'test_count{view="index"} 3',
+            ],
+        )
@@ -0,0 +1,22 @@
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+from core import checks
+
+
+class ProductionProfileTests(TestCase):
+    def test_debug_tooling_allowed_outside_production(self):
+        with override_settings(PRODUCTION=False, DEBUG=True):
+            self.assertEqual(checks.debug_tooling(), [])
+
+    @override_settings(PRODUCTION=True, DEBUG=True)
+    def test_debug_tooling_fails_production_startup(self):
+        """Профиль production не запускается с отладочными инструментами
+        (настройки разработки включают debug_toolbar)"""
+        self.assertEqual(
+            [error.id for error in checks.debug_tooling()],
+            ["core.E001", "core.E002", "core.E003"],
+        )
+        with self.assertRaisesMessage(ImproperlyConfigured, "debug_toolbar"):
+            apps.get_app_config("core").ready()
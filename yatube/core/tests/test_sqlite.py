@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+from django.db import connections
+from django.test import TestCase, override_settings
+
+from core import sqlite
+
+
+class SQLiteTuningTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "db.sqlite3")
+
+    def pragmas(self):
+        wrapper = connections["default"].__class__(
+            {**connections["default"].settings_dict, "NAME": self.path}
+        )
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            return [
+                cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("journal_mode", "synchronous", "busy_timeout")
+            ]
+
+    def test_pragmas_applied_to_new_connections(self):
+        """При SQLITE_TUNING соединение открывается в режиме WAL"""
+        with override_settings(SQLITE_TUNING=True):
+            self.assertEqual(self.pragmas(), ["wal", 1, 5000])
+
+    @override_settings(SQLITE_TUNING=False)
+    def test_pragmas_not_applied_by_default(self):
+        self.assertEqual(self.pragmas()[0], "delete")
+
+    def test_benchmark_counts_operations(self):
+        sqlite.prepare(self.path, rows=100)
+        result = sqlite.benchmark(
+            self.path, {"journal_mode": "WAL"}, True, threads=2, seconds=0.2
+        )
+        self.assertGreater(result["reads"], 0)
+        self.assertGreater(result["writes"], 0)
@@ -0,0 +1,153 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+done_payloads = []
+
+
+@tasks.task("tests.record", batch_size=2)
+def record(payloads):
+    done_payloads.append(payloads)
+
+
+@tasks.task("tests.fail", max_attempts=2)
+def fail(payloads):
+    raise RuntimeError("Ошибка в задаче")
+
+
+@override_settings(
+    TASKS_EAGER=False, TASKS_RETRY_DELAY=10, TASKS_VISIBILITY_TIMEOUT=300
+)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        done_payloads.clear()
+
+    def make_visible(self):
+        Task.objects.update(run_after=timezone.now(), locked_until=None)
+
+    def test_batches_of_one_kind(self):
+        for number in range(3):
+            tasks.enqueue("tests.record", number=number)
+        worker = tasks.Worker()
+        self.assertEqual(worker.run_once(), 2)
+        self.assertEqual(worker.run_once(), 1)
+        self.assertEqual(worker.run_once(), 0)
+        self.assertEqual(
+            done_payloads, [[{"number": 0}, {"number": 1}], [{"number": 2}]]
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_key_deduplicates_pending_tasks(self):
+        tasks.enqueue("tests.record", key="a", number=1)
+        tasks.enqueue("tests.record", key="a", number=2)
+        tasks.enqueue("tests.record", key="b", number=3)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_key_does_not_match_claimed_task(self):
+        """Пока задача выполняется, та же задача ставится в очередь снова:
+        выполняемая могла не увидеть последних изменений"""
+        tasks.enqueue("tests.record", key="a", number=1)
+        _, claimed = tasks.Worker().claim()
+        tasks.enqueue("tests.record", key="a", number=2)
+        self.assertEqual(Task.objects.count(), 2)
+        tasks.enqueue("tests.record", key="a", number=3)
+        self.assertEqual(Task.objects.count(), 2)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_runs_immediately(self):
+        tasks.enqueue_many("tests.record", [{"number": 1}, {"number": 2}])
+        self.assertEqual(done_payloads, [[{"number": 1}, {"number": 2}]])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_failure_is_logged_not_raised(self):
+        with self.assertLogs("yatube.tasks", "ERROR"):
+            tasks.enqueue("tests.fail")
+
+    def test_retry_with_backoff_then_dead(self):
+        tasks.enqueue("tests.fail")
+        worker = tasks.Worker()
+        before = timezone.now()
+        with self.assertLogs("yatube.tasks", "ERROR"):
+            worker.run_once()
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertFalse(task.dead)
+        self.assertGreaterEqual(task.run_after, before + timedelta(seconds=10))
+        self.assertIn("Ошибка в задаче", task.last_error)
+        # До срока повтора задача не видна исполнителю.
+        self.assertEqual(worker.run_once(), 0)
+        self.make_visible()
+        with self.assertLogs("yatube.tasks", "ERROR"):
+            worker.run_once()
+        task.refresh_from_db()
+        self.assertEqual(task.attempts, 2)
+        self.assertTrue(task.dead)
+        self.make_visible()
+        self.assertEqual(worker.run_once(), 0)
+
+    def test_backoff_is_exponential_and_capped(self):
+        with self.settings(TASKS_RETRY_MAX_DELAY=60):
+            self.assertEqual(
+                [tasks.backoff(attempt).seconds for attempt in range(1, 5)],
+                [10, 20, 40, 60],
+            )
+
+    def test_claimed_tasks_return_after_visibility_timeout(self):
+        tasks.enqueue("tests.record", number=1)
+        crashed, other = tasks.Worker(), tasks.Worker()
+        _, claimed = crashed.claim()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(other.run_once(), 0)
+        Task.objects.update(locked_until=timezone.now())
+        self.assertEqual(other.run_once(), 1)
+        self.assertEqual(done_payloads, [[{"number": 1}]])
+        self.assertEqual(Task.objects.count(), 0)
+
+    def test_unknown_task_is_dead(self):
+        Task.objects.create(name="tests.missing")
+        self.assertEqual(tasks.Worker().run_once(), 1)
+        self.assertTrue(Task.objects.get().dead)
+
+    def test_post_side_effects_run_in_worker(self):
+        author = User.objects.create_user(username="author")
+        reader = User.objects.create_user(username="reader")
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text="Отложенный пост")
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(
+            set(Task.objects.values_list("name", flat=True)),
+            {"posts.backfill", "posts.fan_out", "posts.index"},
+        )
+        out = io.StringIO()
+        call_command("run_worker", "--once", stdout=out)
+        self.assertIn("Выполнено задач: 3", out.getvalue())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=reader, post=post).exists()
+        )
+        self.assertFalse(Task.objects.exists())
+
+    def test_task_is_rolled_back_with_its_data(self):
+        """Задачи нового поста ставятся в той же транзакции, что и пост"""
+        author = User.objects.create_user(username="author")
+        self.client.force_login(author)
+        with mock.patch("posts.views.redirect", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(
+                    reverse("posts:post_create"), {"text": "Пост"}
+                )
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,14 @@
+from django.template import engines
+from django.test import TestCase
+
+from core import warmup
+
+
+class TemplateWarmupTests(TestCase):
+    def test_warm_up_loads_project_templates(self):
+        loaded, errors = warmup.warm_up()
+        self.assertEqual(errors, [])
+        names = warmup.template_names(engines["django"])
+        self.assertIn("includes/post_card.html", names)
+        self.assertIn("admin/base.html", names)
+        self.assertEqual(loaded, len(names))
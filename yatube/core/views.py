@@ -1,5 +1,11 @@
+import secrets
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from core import metrics as request_metrics
+
 
 def page_not_found(request, exception):
     return render(request, "core/404.html", {"path": request.path}, status=404)
@@ -11,3 +17,22 @@ def csrf_failure(request, reason=""):
 
 def server_error(request):
     return render(request, "core/500.html", status=500)
+
+
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus. Доступны
+    сотрудникам и сборщику с заголовком Authorization: Bearer METRICS_TOKEN.
+    """
+    if not (request.user.is_staff or _has_metrics_token(request)):
+        raise Http404
+    return HttpResponse(
+        request_metrics.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+def _has_metrics_token(request):
+    if not settings.METRICS_TOKEN:
+        return False
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    return secrets.compare_digest(header, f"Bearer {settings.METRICS_TOKEN}")
@@ -0,0 +1,41 @@
+"""Предварительная загрузка шаблонов.
+
+С кэширующим загрузчиком (профиль production) шаблон разбирается при
+первом обращении и дальше берётся из памяти процесса. warm_up() загружает
+все шаблоны проекта и приложений заранее, чтобы первый запрос к каждому
+процессу не платил за разбор.
+"""
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+EXTENSIONS = (".html", ".txt")
+
+
+def template_names(engine):
+    """Имена шаблонов из каталогов DIRS и templates/ приложений."""
+    names = set()
+    for directory in [*engine.dirs, *get_app_template_dirs("templates")]:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(EXTENSIONS):
+                    path = os.path.relpath(os.path.join(root, name), directory)
+                    names.add(path.replace(os.sep, "/"))
+    return sorted(names)
+
+
+def warm_up():
+    """Загружает все шаблоны; возвращает число загруженных и ошибки."""
+    loaded, errors = 0, []
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateDoesNotExist:
+                pass  # каталог не подключён к загрузчикам движка
+            except TemplateSyntaxError as error:
+                errors.append((name, error))
+            else:
+                loaded += 1
+    return loaded, errors
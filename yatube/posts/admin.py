@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Post, Group, Comment, Follow
+
+from . import search
+from .models import ApiToken, Post, Group, Comment, Follow
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +11,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ("pub_date",)
     empty_value_display = "-пусто-"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо LIKE '%...%'.
+        if not search_term:
+            return queryset, False
+        return queryset.filter(search.matching(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ("pk", "title", "slug")
@@ -24,7 +32,14 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ("user", "author")
 
 
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ("user", "created")
+    # Ключ выдаёт команда issue_api_token, в базе только его хеш.
+    readonly_fields = ("key_hash",)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(ApiToken, ApiTokenAdmin)
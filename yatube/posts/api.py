@@ -0,0 +1,301 @@
+"""JSON API для чтения лент, групп, профилей и комментариев.
+
+Выборки те же, что у HTML-страниц в posts.views, но читаются через
+.values(): объекты моделей не создаются, из базы берутся только поля из
+?fields=. Связанные авторы и группы (?include=author,group) загружаются
+одним запросом на связь для всей страницы и подставляются вместо id.
+Страницы выбираются по курсору (?cursor=, размер -- ?limit=).
+"""
+import functools
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+
+from posts import timeline, views
+from posts.models import Comment, Group, Post, User
+from posts.paginators import CursorPaginator
+
+MAX_LIMIT = 100
+
+# Поле ответа -> колонка в .values()
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "updated": "updated",
+    "author": "author_id",
+    "group": "group_id",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+COMMENT_FIELDS = {
+    "id": "id",
+    "post": "post_id",
+    "author": "author_id",
+    "text": "text",
+    "created": "created",
+}
+GROUP_FIELDS = {
+    "id": "id",
+    "slug": "slug",
+    "title": "title",
+    "description": "description",
+}
+USER_FIELDS = {
+    "id": "id",
+    "username": "username",
+    "first_name": "first_name",
+    "last_name": "last_name",
+}
+PROFILE_FIELDS = {
+    **USER_FIELDS,
+    "posts": "stats__posts",
+    "comments": "stats__comments",
+    "followers": "stats__followers",
+    "following": "stats__following",
+}
+# Связь, которую можно подставить через ?include=: модель и её поля
+RELATIONS = {
+    "author": (User, USER_FIELDS),
+    "group": (Group, GROUP_FIELDS),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _names(request, parameter, allowed):
+    value = request.GET.get(parameter)
+    if not value:
+        return None
+    names = [name for name in value.split(",") if name]
+    unknown = set(names) - set(allowed)
+    if unknown:
+        raise ApiError(
+            f"Неизвестные значения {parameter}: {', '.join(sorted(unknown))}"
+        )
+    return names
+
+
+def _fields(request, available, relations=()):
+    """Поля ответа из ?fields= (по умолчанию все) и связи из ?include=."""
+    names = _names(request, "fields", available) or available
+    includes = _names(request, "include", relations) or []
+    # Без id связанной записи её нечего подставлять.
+    return (
+        {
+            name: column
+            for name, column in available.items()
+            if name in names or name in includes
+        },
+        includes,
+    )
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", settings.POSTS_PER_PAGE))
+    except ValueError:
+        raise ApiError("limit должен быть числом")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _rows(rows, fields):
+    """Словари .values() с колонками -> словари ответа с полями."""
+    result = []
+    for row in rows:
+        item = {name: _value(row[column]) for name, column in fields.items()}
+        if "image" in item:
+            item["image"] = (
+                default_storage.url(item["image"]) if item["image"] else None
+            )
+        result.append(item)
+    return result
+
+
+def represent(objects, fields):
+    """Объекты моделей в том же виде, что и строки .values() в ответах."""
+    return _rows(
+        (
+            {column: getattr(obj, column) for column in fields.values()}
+            for obj in objects
+        ),
+        fields,
+    )
+
+
+def _hydrate(items, includes):
+    """Подставляет связанные объекты вместо id: один запрос на связь."""
+    for name in includes:
+        model, fields = RELATIONS[name]
+        ids = {item[name] for item in items if item.get(name) is not None}
+        if not ids:
+            continue
+        related = {
+            row["id"]: _rows([row], fields)[0]
+            for row in model.objects.filter(pk__in=ids).values(
+                *fields.values()
+            )
+        }
+        for item in items:
+            if item.get(name) is not None:
+                item[name] = related.get(item[name])
+    return items
+
+
+def _result(page, results):
+    return {
+        "results": results,
+        "next_cursor": page.next_cursor or None,
+        "previous_cursor": page.previous_cursor or None,
+    }
+
+
+def _page(request, queryset, available, ordering, relations=()):
+    """Страница записей queryset по курсору в виде ответа API."""
+    fields, includes = _fields(request, available, relations)
+    keys = [field.lstrip("-") for field in ordering]
+    columns = {*fields.values(), *keys}
+    page = CursorPaginator(
+        queryset.values(*columns), _limit(request), ordering
+    ).page(request.GET.get("cursor"))
+    return _result(page, _hydrate(_rows(page, fields), includes))
+
+
+def _follow_page(request, user):
+    """Лента подписок: записи ленты по курсору, затем посты по id."""
+    entries, ordering = timeline.feed(user)
+    if entries.model is Post:
+        return _page(request, entries, POST_FIELDS, ordering, RELATIONS)
+    fields, includes = _fields(request, POST_FIELDS, RELATIONS)
+    page = CursorPaginator(
+        entries.values("post_id", "pub_date"), _limit(request), ordering
+    ).page(request.GET.get("cursor"))
+    ids = [entry["post_id"] for entry in page]
+    posts = {
+        row["id"]: row
+        for row in Post.objects.filter(pk__in=ids).values(
+            "id", *fields.values()
+        )
+    }
+    rows = [posts[post_id] for post_id in ids if post_id in posts]
+    return _result(page, _hydrate(_rows(rows, fields), includes))
+
+
+def api_view(view):
+    """Ответ представления -- JSON; ApiError и 404 -- JSON с ошибкой."""
+
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return JsonResponse({"error": "Метод не разрешён"}, status=405)
+        try:
+            return JsonResponse(view(request, *args, **kwargs))
+        except ApiError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+        except Http404:
+            return JsonResponse({"error": "Не найдено"}, status=404)
+
+    return functools.wraps(view)(wrapper)
+
+
+def methods(read, write):
+    """Одно представление на адрес: POST -- запись, остальное -- чтение."""
+
+    def view(request, *args, **kwargs):
+        handler = write if request.method == "POST" else read
+        return handler(request, *args, **kwargs)
+
+    # Запись авторизуется токеном, а не сессией, CSRF ей не нужен.
+    return csrf_exempt(view)
+
+
+@api_view
+def posts(request):
+    return _page(
+        request,
+        views.index_posts(),
+        POST_FIELDS,
+        timeline.POST_ORDERING,
+        RELATIONS,
+    )
+
+
+@api_view
+def post(request, post_id):
+    fields, includes = _fields(request, POST_FIELDS, RELATIONS)
+    row = get_object_or_404(Post.objects.values(*fields.values()), pk=post_id)
+    return _hydrate(_rows([row], fields), includes)[0]
+
+
+@api_view
+def comments(request, post_id):
+    get_object_or_404(Post.objects.values("id"), pk=post_id)
+    return _page(
+        request,
+        Comment.objects.filter(post_id=post_id),
+        COMMENT_FIELDS,
+        ("created", "id"),
+        ("author",),
+    )
+
+
+@api_view
+def groups(request):
+    return _page(request, Group.objects.all(), GROUP_FIELDS, ("slug", "id"))
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return _page(
+        request,
+        views.group_posts(group),
+        POST_FIELDS,
+        timeline.POST_ORDERING,
+        RELATIONS,
+    )
+
+
+@api_view
+def profile(request, username):
+    fields, _ = _fields(request, PROFILE_FIELDS)
+    row = get_object_or_404(
+        User.objects.values(*fields.values()), username=username
+    )
+    profile = _rows([row], fields)[0]
+    # У пользователя без постов и подписок строки счётчиков может не быть.
+    for name in ("posts", "comments", "followers", "following"):
+        if name in profile and profile[name] is None:
+            profile[name] = 0
+    return profile
+
+
+@api_view
+def author_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return _page(
+        request,
+        views.author_posts(author),
+        POST_FIELDS,
+        timeline.POST_ORDERING,
+        RELATIONS,
+    )
+
+
+@api_view
+def follow(request):
+    if not request.user.is_authenticated:
+        raise ApiError("Нужна авторизация", status=401)
+    return _follow_page(request, request.user)
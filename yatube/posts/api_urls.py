@@ -0,0 +1,21 @@
+from django.urls import path
+
+from . import api, api_writes
+
+app_name = "api"
+
+urlpatterns = [
+    path(
+        "posts/",
+        api.methods(api.posts, api_writes.create_posts),
+        name="posts",
+    ),
+    path("posts/<int:post_id>/", api.post, name="post"),
+    path("posts/<int:post_id>/comments/", api.comments, name="comments"),
+    path("comments/", api_writes.create_comments, name="create_comments"),
+    path("groups/", api.groups, name="groups"),
+    path("groups/<slug:slug>/posts/", api.group_posts, name="group_posts"),
+    path("users/<str:username>/", api.profile, name="profile"),
+    path("users/<str:username>/posts/", api.author_posts, name="author_posts"),
+    path("follow/", api.follow, name="follow"),
+]
@@ -0,0 +1,142 @@
+"""JSON API для записи: пачки постов и комментариев.
+
+Запросы авторизуются токеном (заголовок «Authorization: Token <ключ>»,
+ключ выдаёт команда issue_api_token). Пачка создаётся в одной транзакции
+одним bulk_create (см. posts.batches): либо все записи, либо ни одной.
+С заголовком Idempotency-Key повтор запроса возвращает сохранённый
+исходный ответ (см. posts.idempotency).
+"""
+import functools
+import hashlib
+import json
+import secrets
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from posts import api, batches, idempotency
+from posts.models import ApiToken
+
+
+def _hash(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_token(user):
+    """Выпускает новый ключ пользователя взамен прежнего."""
+    key = secrets.token_hex(20)
+    ApiToken.objects.update_or_create(
+        user=user, defaults={"key_hash": _hash(key)}
+    )
+    return key
+
+
+def authenticate(request):
+    scheme, _, key = request.headers.get("Authorization", "").partition(" ")
+    if scheme != "Token" or not key.strip():
+        return None
+    token = (
+        ApiToken.objects.select_related("user")
+        .filter(key_hash=_hash(key.strip()))
+        .first()
+    )
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+def _items(request, name):
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        raise api.ApiError("Тело запроса -- не JSON")
+    items = payload.get(name) if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        raise api.ApiError(f"Нужен непустой список {name}")
+    if len(items) > settings.API_BATCH_MAX:
+        raise api.ApiError(
+            f"Не больше {settings.API_BATCH_MAX} записей в пачке"
+        )
+    if not all(isinstance(item, dict) for item in items):
+        raise api.ApiError(f"Элементы {name} должны быть объектами")
+    return items
+
+
+def _response(status, body, replayed=False):
+    response = HttpResponse(
+        body, status=status, content_type="application/json"
+    )
+    if replayed:
+        response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _replay(stored, fingerprint):
+    if stored.fingerprint != fingerprint:
+        raise api.ApiError(
+            "Ключ Idempotency-Key уже использован с другим запросом",
+            status=422,
+        )
+    return _response(stored.status, stored.body, replayed=True)
+
+
+def _execute(request, user, create):
+    """Создаёт записи и, если передан ключ, сохраняет ответ в той же
+    транзакции."""
+    key = request.headers.get("Idempotency-Key")
+    fingerprint = idempotency.fingerprint(request) if key else None
+    if key:
+        stored = idempotency.lookup(user, key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+    try:
+        with transaction.atomic():
+            body = json.dumps(
+                {"results": create(request, user)}, cls=DjangoJSONEncoder
+            )
+            if key:
+                idempotency.remember(user, key, fingerprint, 201, body)
+    except IntegrityError:
+        # Тот же ключ одновременно сохранил параллельный запрос.
+        stored = idempotency.lookup(user, key) if key else None
+        if stored is None:
+            raise
+        return _replay(stored, fingerprint)
+    return _response(201, body)
+
+
+def api_write(create):
+    """POST-представление: токен, транзакция и Idempotency-Key."""
+
+    @functools.wraps(create)
+    def view(request, *args, **kwargs):
+        if request.method != "POST":
+            return JsonResponse({"error": "Метод не разрешён"}, status=405)
+        user = authenticate(request)
+        if user is None:
+            return JsonResponse({"error": "Нужен токен API"}, status=401)
+        try:
+            return _execute(request, user, create)
+        except api.ApiError as error:
+            return JsonResponse({"error": str(error)}, status=error.status)
+        except batches.InvalidBatch as error:
+            return JsonResponse(
+                {"error": str(error), "items": error.errors}, status=400
+            )
+
+    return csrf_exempt(view)
+
+
+@api_write
+def create_posts(request, user):
+    posts = batches.create_posts(user, _items(request, "posts"))
+    return api.represent(posts, api.POST_FIELDS)
+
+
+@api_write
+def create_comments(request, user):
+    comments = batches.create_comments(user, _items(request, "comments"))
+    return api.represent(comments, api.COMMENT_FIELDS)
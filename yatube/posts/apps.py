@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = "posts"
     verbose_name = "Публикации и группы"
+
+    def ready(self):
+        import posts.signals  # noqa: F401
+        import posts.tasks  # noqa: F401
@@ -0,0 +1,131 @@
+"""Пакетное создание постов и комментариев одного автора.
+
+Записи пачки вставляются одним bulk_create (в SQLite id затем читаются
+из базы, см. _bulk_create). Сигналы при этом не вызываются, поэтому то,
+что для одиночной записи делают обработчики из posts.signals (счётчики,
+ленты подписок, поисковый индекс, версии лент, живые обновления), здесь
+выполняется для всей пачки сразу, а ленты подписок и поисковый индекс
+обновляют фоновые задачи (posts.tasks).
+Вызывать внутри транзакции: версии лент сдвигаются после её фиксации,
+чтобы другой запрос не закэшировал под новой версией ленту без пачки.
+"""
+from collections import Counter
+
+from django.db import NotSupportedError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import tasks
+from posts import caching, live, stats, timeline
+from posts.models import Comment, Group, Post
+
+
+class InvalidBatch(ValueError):
+    def __init__(self, errors):
+        super().__init__("Ошибки в записях пачки")
+        # Номер записи в пачке -> {поле: сообщение}
+        self.errors = errors
+
+
+def _text(item):
+    text = item.get("text")
+    if not isinstance(text, str) or not text.strip():
+        return None
+    return text
+
+
+def _id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _bulk_create(model, objects):
+    """Вставляет записи одним bulk_create и проставляет им id."""
+    with transaction.atomic():
+        model.objects.bulk_create(
+            objects,
+            batch_size=connection.ops.bulk_batch_size(
+                model._meta.concrete_fields, objects
+            ),
+        )
+        if connection.features.can_return_ids_from_bulk_insert:
+            return
+        if connection.vendor != "sqlite":
+            raise NotSupportedError(
+                "Пакетная запись требует INSERT ... RETURNING или SQLite"
+            )
+        # SQLite не возвращает id из bulk_create. Первая запись в
+        # транзакции берёт единственную на базу блокировку записи и держит
+        # её до фиксации, поэтому последние len(objects) записей -- это
+        # только что вставленные.
+        ids = model.objects.order_by("-pk").values_list("pk", flat=True)
+        for obj, pk in zip(objects, reversed(list(ids[: len(objects)]))):
+            obj.pk = pk
+
+
+def create_posts(author, items):
+    """Создаёт посты из словарей с полями text и group (id группы)."""
+    groups = {_id(item.get("group")) for item in items} - {None}
+    groups = set(
+        Group.objects.filter(pk__in=groups).values_list("pk", flat=True)
+    )
+    posts, errors = [], {}
+    for index, item in enumerate(items):
+        text, group = _text(item), item.get("group")
+        item_errors = {}
+        if text is None:
+            item_errors["text"] = "Обязательное поле"
+        if group is not None and _id(group) not in groups:
+            item_errors["group"] = "Нет такой группы"
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        posts.append(Post(author=author, text=text, group_id=group))
+    if errors:
+        raise InvalidBatch(errors)
+    _bulk_create(Post, posts)
+    stats.increment(author.pk, posts=len(posts))
+    tasks.enqueue_many("posts.fan_out", ({"post": post.pk} for post in posts))
+    tasks.enqueue_many("posts.index", ({"post": post.pk} for post in posts))
+    scopes = {caching.GLOBAL, caching.author_scope(author.pk)}
+    scopes.update(
+        caching.group_scope(post.group_id) for post in posts if post.group_id
+    )
+    transaction.on_commit(lambda: caching.bump(*scopes))
+    live.publish_posts(posts)
+    return posts
+
+
+def create_comments(author, items):
+    """Создаёт комментарии из словарей с полями post (id поста) и text."""
+    posts = {_id(item.get("post")) for item in items} - {None}
+    posts = Post.objects.only("id", "author_id", "group_id").in_bulk(posts)
+    comments, errors = [], {}
+    for index, item in enumerate(items):
+        text, post_id = _text(item), _id(item.get("post"))
+        item_errors = {}
+        if text is None:
+            item_errors["text"] = "Обязательное поле"
+        if post_id not in posts:
+            item_errors["post"] = "Нет такого поста"
+        if item_errors:
+            errors[index] = item_errors
+            continue
+        comments.append(Comment(author=author, post_id=post_id, text=text))
+    if errors:
+        raise InvalidBatch(errors)
+    _bulk_create(Comment, comments)
+    now = timezone.now()
+    counts = Counter(comment.post_id for comment in comments)
+    scopes = set()
+    for post_id, count in counts.items():
+        Post.objects.filter(pk=post_id).update(
+            comments_count=F("comments_count") + count, updated=now
+        )
+        scopes.update(caching.post_scopes(posts[post_id]))
+    stats.increment(author.pk, comments=len(comments))
+    transaction.on_commit(lambda: caching.bump(*scopes))
+    timeline.changed(*(posts[post_id].author_id for post_id in counts))
+    live.publish_comments(comments)
+    return comments
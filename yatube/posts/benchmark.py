@@ -0,0 +1,523 @@
+"""Замер задержки и пропускной способности страниц лент.
+
+seed() заполняет базу пользователями, группами, постами, подписками,
+комментариями и картинками (тексты -- Faker, запись -- через
+posts.importing, как при загрузке архива). run() гоняет запросы к
+сценариям из scenarios() с заданной параллельностью через тестовый клиент
+или локальный WSGI- или ASGI-сервер и считает перцентили задержки, запросы
+к базе на страницу и пиковый RSS процесса. compare() сверяет результат с
+сохранённым эталоном.
+
+У серверов одинаковое число потоков-обработчиков (workers), как у
+синхронных воркеров WSGI в бою. С slow_clients сервер всё время замера
+держит столько медленных соединений, которые передают заголовки по
+строке раз в SLOW_CLIENT_INTERVAL секунд: WSGI-обработчик занят таким
+клиентом целиком, ASGI-сервер ждёт его в цикле событий.
+"""
+import asyncio
+import io
+import itertools
+import math
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from core.asgi import ASGIHandler, serve
+from posts.importing import Importer
+from posts.models import Group, Post, User
+
+VOLUMES = {
+    "users": 200,
+    "groups": 10,
+    "posts": 5000,
+    "follows": 2000,
+    "comments": 20000,
+    "images": 50,
+}
+READER = "benchmark-reader"
+QUERIES_HEADER = "X-Benchmark-Queries"
+SLOW_CLIENT_INTERVAL = 1
+# Ответ, которого нет дольше, считается ошибкой
+HTTP_TIMEOUT = 10
+
+
+def seed(volumes=VOLUMES, seed=1):
+    """Заполняет пустую базу; возвращает число созданных записей."""
+    fake = Faker("ru_RU")
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+    Group.objects.bulk_create(
+        Group(title=fake.sentence(nb_words=2)[:200], slug=f"group-{number}")
+        for number in range(volumes["groups"])
+    )
+    slugs = [f"group-{number}" for number in range(volumes["groups"])]
+    # Читатель ленты подписок -- первый пользователь, подписки
+    # распределены между ним и остальными поровну.
+    users = [READER] + [f"user-{n}" for n in range(1, volumes["users"])]
+    importer = Importer(create_users=True)
+    importer.run(
+        itertools.chain(
+            (
+                {
+                    "type": "post",
+                    "author": rng.choice(users[1:]),
+                    "group": rng.choice(slugs + [""]),
+                    "text": fake.paragraph(nb_sentences=5),
+                    "pub_date": fake.date_time_between(
+                        "-2y", tzinfo=timezone.utc
+                    ).isoformat(),
+                }
+                for _ in range(volumes["posts"])
+            ),
+            (
+                {
+                    "type": "follow",
+                    "user": READER if number % 2 else rng.choice(users),
+                    "author": rng.choice(users[1:]),
+                }
+                for number in range(volumes["follows"])
+            ),
+        )
+    )
+    post_ids = list(Post.objects.values_list("pk", flat=True))
+    importer.run(
+        {
+            "type": "comment",
+            "post": rng.choice(post_ids),
+            "author": rng.choice(users),
+            "text": fake.sentence(),
+        }
+        for _ in range(volumes["comments"])
+    )
+    importer.rebuild_derived()
+    _attach_images(rng.sample(post_ids, min(volumes["images"], len(post_ids))))
+    return importer.created
+
+
+def _attach_images(post_ids):
+    for number, post_id in enumerate(post_ids):
+        buffer = io.BytesIO()
+        color = (number * 37 % 256, number * 91 % 256, 128)
+        Image.new("RGB", (1200, 800), color).save(buffer, "JPEG")
+        name = default_storage.save(f"posts/benchmark-{number}.jpg", buffer)
+        Post.objects.filter(pk=post_id).update(image=name)
+
+
+def scenarios(pages=3):
+    """Адреса страниц для каждого сценария и пользователь, от имени
+    которого они запрашиваются (None -- аноним)."""
+    authors = (
+        Post.objects.values_list("author__username", flat=True)
+        .annotate(total=Count("pk"))
+        .order_by("-total")[:pages]
+    )
+    commented = Post.objects.order_by("-comments_count", "-pk").values_list(
+        "pk", flat=True
+    )[: pages * 5]
+    feed = [f"?page={page}" for page in range(1, pages + 1)]
+    return {
+        "index": (
+            [reverse("posts:index") + query for query in feed],
+            None,
+        ),
+        "group_list": (
+            [
+                reverse("posts:group_list", args=[slug])
+                for slug in Group.objects.values_list("slug", flat=True)[
+                    :pages
+                ]
+            ],
+            None,
+        ),
+        "profile": (
+            [reverse("posts:profile", args=[name]) for name in authors],
+            None,
+        ),
+        "follow_index": (
+            [reverse("posts:follow_index") + query for query in feed],
+            User.objects.filter(username=READER).first(),
+        ),
+        "post_detail": (
+            [reverse("posts:post_detail", args=[pk]) for pk in commented],
+            None,
+        ),
+    }
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def peak_rss():
+    """Пиковый размер резидентной памяти процесса в мегабайтах."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS -- в байтах.
+    return usage / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ClientDriver:
+    """Запросы через тестовый клиент Django в потоке вызывающего."""
+
+    def __init__(self, user):
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, url):
+        counter = _QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.client.get(url)
+        return response.status_code, counter.count
+
+
+class _CountingHandler(WSGIHandler):
+    """WSGI-приложение, сообщающее число запросов к базе в заголовке."""
+
+    def __call__(self, environ, start_response):
+        counter = _QueryCounter()
+
+        def counted_start_response(status, headers, exc_info=None):
+            headers.append((QUERIES_HEADER, str(counter.count)))
+            return start_response(status, headers, exc_info)
+
+        try:
+            with connection.execute_wrapper(counter):
+                return super().__call__(environ, counted_start_response)
+        finally:
+            connections.close_all()
+
+
+class _CountingASGIHandler(ASGIHandler):
+    def respond(self, environ, loop, send):
+        counter = _QueryCounter()
+        try:
+            with connection.execute_wrapper(counter):
+                status, headers, content = super().respond(environ, loop, send)
+        finally:
+            connections.close_all()
+        headers.append((QUERIES_HEADER.encode(), str(counter.count).encode()))
+        return status, headers, content
+
+
+class _QuietHandler(WSGIRequestHandler):
+    # Обработчик не ждёт заголовков бесконечно, как и воркеры в бою.
+    timeout = 30
+
+    def log_message(self, *args):
+        pass
+
+
+class _PooledWSGIServer(ThreadedWSGIServer):
+    """WSGI-сервер с ограниченным числом потоков-обработчиков."""
+
+    def __init__(self, *args, workers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(
+            self.process_request_thread, request, client_address
+        )
+
+    def handle_error(self, request, client_address):
+        pass  # медленные клиенты обрываются в конце замера
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+class WSGIServer:
+    """WSGI-сервер Django на свободном локальном порту: workers потоков
+    или, если workers не задан, поток на соединение."""
+
+    def __init__(self, workers=None):
+        if workers:
+            self.server = _PooledWSGIServer(
+                ("127.0.0.1", 0),
+                _QuietHandler,
+                allow_reuse_address=False,
+                workers=workers,
+            )
+        else:
+            self.server = ThreadedWSGIServer(
+                ("127.0.0.1", 0), _QuietHandler, allow_reuse_address=False
+            )
+        self.server.set_app(_CountingHandler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class ASGIServer:
+    """core.asgi.serve с ASGIHandler из workers потоков в отдельном
+    потоке с циклом событий."""
+
+    def __init__(self, workers=None):
+        self.application = _CountingASGIHandler(threads=workers)
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run)
+        self.address = None
+        self.task = None
+
+    def _started(self, server):
+        self.address = server.sockets[0].getsockname()[:2]
+        self.ready.set()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(
+            serve(self.application, "127.0.0.1", 0, self._started)
+        )
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+
+    @property
+    def url(self):
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join()
+        self.application.executor.shutdown(wait=True)
+
+
+class SlowClients:
+    """count соединений, которые бесконечно медленно шлют заголовки."""
+
+    def __init__(self, address, count, interval=SLOW_CLIENT_INTERVAL):
+        self.address = address
+        self.count = count
+        self.interval = interval
+        self.sockets = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._trickle, daemon=True)
+
+    def _trickle(self):
+        while not self.stopped.wait(self.interval):
+            for sock in self.sockets:
+                try:
+                    sock.sendall(b"X-Slow: 1\r\n")
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        for _ in range(self.count):
+            sock = socket.create_connection(self.address)
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+            self.sockets.append(sock)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        for sock in self.sockets:
+            sock.close()
+
+
+class HTTPDriver:
+    """Запросы по HTTP к локальному серверу; сессия берётся у тестового
+    клиента."""
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url
+        self.headers = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+            self.headers["Cookie"] = f"{cookie.key}={cookie.value}"
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar())
+        )
+
+    def get(self, url):
+        request = urllib.request.Request(
+            self.base_url + url, headers=self.headers
+        )
+        try:
+            with self.opener.open(request, timeout=HTTP_TIMEOUT) as response:
+                response.read()
+                return response.status, int(response.headers[QUERIES_HEADER])
+        except urllib.error.HTTPError as error:
+            return error.code, int(error.headers.get(QUERIES_HEADER, 0))
+        except (urllib.error.URLError, OSError):
+            return 0, 0
+
+
+def _measure(driver, urls, count):
+    timings, queries, errors = [], [], 0
+    for url in itertools.islice(itertools.cycle(urls), count):
+        started = time.perf_counter()
+        status, executed = driver.get(url)
+        timings.append(time.perf_counter() - started)
+        queries.append(executed)
+        errors += status != 200
+    return timings, queries, errors
+
+
+def run_scenario(make_driver, urls, user, requests=200, concurrency=4):
+    """Выполняет requests запросов в concurrency потоков."""
+    results = []
+
+    def worker(driver, count):
+        try:
+            results.append(_measure(driver, urls, count))
+        finally:
+            if concurrency > 1:
+                connections.close_all()
+
+    # Вход пользователя пишет в базу, поэтому клиенты создаются до запуска
+    # потоков: тестовая база SQLite в памяти не ждёт снятия блокировки.
+    drivers = [make_driver(user) for _ in range(concurrency)]
+    shares = [
+        requests // concurrency + (number < requests % concurrency)
+        for number in range(concurrency)
+    ]
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(drivers[0], requests)
+    else:
+        threads = [
+            threading.Thread(target=worker, args=job)
+            for job in zip(drivers, shares)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    timings = [value for result in results for value in result[0]]
+    queries = [value for result in results for value in result[1]]
+    return {
+        "requests": len(timings),
+        "errors": sum(result[2] for result in results),
+        "rps": len(timings) / elapsed,
+        "p50": percentile(timings, 50) * 1000,
+        "p95": percentile(timings, 95) * 1000,
+        "p99": percentile(timings, 99) * 1000,
+        "queries": sum(queries) / max(len(queries), 1),
+        "rss": peak_rss(),
+    }
+
+
+SERVERS = {"wsgi": WSGIServer, "asgi": ASGIServer}
+
+
+def run(
+    driver="client",
+    requests=200,
+    concurrency=4,
+    warmup=10,
+    only=None,
+    workers=None,
+    slow_clients=0,
+):
+    """Замеряет все сценарии (или только перечисленные в only)."""
+    with ExitStack() as stack:
+        if driver == "client":
+            make_driver = ClientDriver
+        else:
+            server = stack.enter_context(SERVERS[driver](workers))
+
+            def make_driver(user):
+                return HTTPDriver(user, server.url)
+
+        report = {}
+        for name, (urls, user) in scenarios().items():
+            if only and name not in only:
+                continue
+            # Прогрев в одном потоке: миниатюры, шаблоны, кэш фрагментов.
+            run_scenario(make_driver, urls, user, warmup, concurrency=1)
+            with ExitStack() as slow:
+                if slow_clients:
+                    slow.enter_context(
+                        SlowClients(server.address, slow_clients)
+                    )
+                report[name] = run_scenario(
+                    make_driver, urls, user, requests, concurrency
+                )
+        return report
+
+
+def compare(report, baseline, tolerance=0.25):
+    """Регрессии относительно эталона: p95 вырос больше чем на tolerance
+    или страница стала делать больше запросов к базе."""
+    regressions = []
+    for name, result in report.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result["p95"] > expected["p95"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {result['p95']:.1f} мс, "
+                f"в эталоне {expected['p95']:.1f} мс"
+            )
+        if result["queries"] > expected["queries"] + 0.5:
+            regressions.append(
+                f"{name}: {result['queries']:.1f} запросов к базе, "
+                f"в эталоне {expected['queries']:.1f}"
+            )
+    return regressions
@@ -0,0 +1,89 @@
+"""Версии лент для фрагментного кэша шаблонов.
+
+У каждой ленты есть версия в кэше: общая, группы, автора и набора
+подписок пользователя. Версия входит в ключ фрагмента, поэтому запись
+(новый пост, правка, удаление, комментарий, подписка) лишь сдвигает
+версию, и старые фрагменты перестают читаться сразу, а сами живут до
+истечения FEED_CACHE_TIMEOUT. Версия -- время последней записи в
+микросекундах, из неё же берётся Last-Modified (см. changed_at).
+"""
+import time
+from datetime import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+
+GLOBAL = "index"
+
+
+def group_scope(group_id):
+    return f"group:{group_id}"
+
+
+def author_scope(author_id):
+    return f"author:{author_id}"
+
+
+def follow_scope(user_id):
+    return f"follow:{user_id}"
+
+
+def _key(scope):
+    return f"feed-version:{scope}"
+
+
+def _initial():
+    # После вытеснения счётчика из кэша версия не должна совпасть с одной
+    # из прежних, поэтому отсчёт начинается с текущего времени.
+    return time.time_ns() // 1000
+
+
+def versions(*scopes):
+    keys = [_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    keys = [_key(scope) for scope in scopes]
+    if not keys:
+        return
+    now = _initial()
+    found = cache.get_many(keys)
+    # Версия растёт, даже если часы этого процесса отстают от часов того,
+    # который сдвинул её последним.
+    cache.set_many(
+        {key: max(now, found.get(key, 0) + 1) for key in keys}, None
+    )
+
+
+def changed_at(versions):
+    """Время последней записи в ленты с версиями versions."""
+    return datetime.fromtimestamp(max(versions) / 10**6, timezone.utc)
+
+
+def post_scopes(post):
+    """Ленты, в которых показывается пост."""
+    scopes = [GLOBAL, author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group_id))
+    return scopes
+
+
+def page_key(page_obj):
+    if getattr(page_obj.paginator, "cursor_mode", False):
+        return f"cursor={page_obj.cursor}"
+    return f"page={page_obj.number}"
+
+
+def feed_key(page_obj, *scopes):
+    """Ключ фрагмента страницы ленты: версии лент и номер/курсор страницы."""
+    parts = [
+        f"{scope}@{version}"
+        for scope, version in zip(scopes, versions(*scopes))
+    ]
+    return ";".join(parts + [page_key(page_obj)])
@@ -0,0 +1,93 @@
+"""Условные GET-запросы (ETag и Last-Modified) к лентам и постам.
+
+Last-Modified -- самое позднее из Post.updated в ленте (MAX по индексу)
+и времени последней записи в её версиях из posts.caching: updated
+меняется при правке поста, новых комментариях и готовых миниатюрах, а
+версии -- ещё и при удалении поста или комментария. ETag дополнительно
+содержит пользователя (от него зависят шапка страницы и кнопки) и сами
+версии, поэтому меняется вместе с ключом фрагментного кэша страницы.
+"""
+from django.db.models import Max
+from django.views.decorators.http import condition
+
+from posts import caching
+from posts.models import Group, Post, User
+
+
+def index(request):
+    latest = Post.objects.aggregate(latest=Max("updated"))["latest"]
+    return latest, caching.versions(caching.GLOBAL)
+
+
+def group_list(request, slug):
+    row = (
+        Group.objects.filter(slug=slug)
+        .annotate(latest=Max("group_list__updated"))
+        .values_list("id", "latest")
+        .first()
+    )
+    if row is None:
+        return None
+    group_id, latest = row
+    return latest, caching.versions(caching.group_scope(group_id))
+
+
+def profile(request, username):
+    row = (
+        User.objects.filter(username=username)
+        .annotate(latest=Max("posts__updated"))
+        .values_list("id", "latest")
+        .first()
+    )
+    if row is None:
+        return None
+    author_id, latest = row
+    scopes = [caching.author_scope(author_id)]
+    if request.user.is_authenticated:
+        # Кнопка «Подписаться»/«Отписаться»
+        scopes.append(caching.follow_scope(request.user.pk))
+    return latest, caching.versions(*scopes)
+
+
+def post_detail(request, post_id):
+    row = (
+        Post.objects.filter(pk=post_id)
+        .values_list("updated", "author_id")
+        .first()
+    )
+    if row is None:
+        return None
+    latest, author_id = row
+    # На странице поста показано число постов автора.
+    return latest, caching.versions(caching.author_scope(author_id))
+
+
+def validated(freshness):
+    """Декоратор condition с ETag и Last-Modified из freshness(request,
+    ...), которая вычисляется один раз на запрос и возвращает пару
+    (время последнего изменения, версии лент) или None, если страницы
+    нет."""
+
+    def state(request, *args, **kwargs):
+        if not hasattr(request, "_freshness"):
+            current = freshness(request, *args, **kwargs)
+            if current is not None:
+                latest, versions = current
+                changed = caching.changed_at(versions)
+                current = max(latest, changed) if latest else changed, versions
+            request._freshness = current
+        return request._freshness
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        if current is None:
+            return None
+        modified, versions = current
+        parts = [request.user.pk or 0, modified.timestamp(), *versions]
+        return "-".join(str(part) for part in parts)
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        return current[0] if current else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
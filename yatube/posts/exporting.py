@@ -0,0 +1,126 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Записи читаются из базы порциями (.iterator(chunk_size) -- в PostgreSQL
+это курсор на стороне сервера) и сразу превращаются в строки NDJSON или
+CSV, при необходимости сжатые gzip. Объекты моделей не создаются, поэтому
+память не зависит от размера таблиц. Формат записей тот же, что читает
+команда import_content (см. posts.importing).
+"""
+import csv
+import io
+import json
+import zlib
+
+from posts.importing import KINDS
+from posts.models import Comment, Follow, Post
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+CSV_FIELDS = (
+    "type",
+    "id",
+    "post",
+    "user",
+    "author",
+    "group",
+    "text",
+    "pub_date",
+    "created",
+)
+# Строки копятся до такого размера перед отправкой клиенту или в файл.
+BUFFER_SIZE = 64 * 1024
+
+SOURCES = {
+    "post": (
+        Post.objects,
+        {
+            "id": "id",
+            "author": "author__username",
+            "group": "group__slug",
+            "text": "text",
+            "pub_date": "pub_date",
+        },
+    ),
+    "comment": (
+        Comment.objects,
+        {
+            "post": "post_id",
+            "author": "author__username",
+            "text": "text",
+            "created": "created",
+        },
+    ),
+    "follow": (
+        Follow.objects,
+        {"user": "user__username", "author": "author__username"},
+    ),
+}
+
+
+def records(kinds=KINDS, chunk_size=2000):
+    """Записи выбранных видов в порядке id, по одной."""
+    for kind in kinds:
+        manager, columns = SOURCES[kind]
+        rows = manager.order_by("pk").values_list(*columns.values())
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = {"type": kind}
+            for name, value in zip(columns, row):
+                if hasattr(value, "isoformat"):
+                    value = value.isoformat()
+                record[name] = value
+            yield record
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Склеивает строки в куски около size байт."""
+    parts, length = [], 0
+    for line in lines:
+        data = line.encode()
+        parts.append(data)
+        length += len(data)
+        if length >= size:
+            yield b"".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+def gzipped(chunks):
+    """Сжимает поток байтов в формат gzip по мере поступления."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(kinds=KINDS, file_format="ndjson", compress=False, chunk_size=2000):
+    """Байтовые куски выгрузки в формате file_format."""
+    lines = ndjson_lines if file_format == "ndjson" else csv_lines
+    chunks = buffered(lines(records(kinds, chunk_size)))
+    return gzipped(chunks) if compress else chunks
+
+
+def filename(kinds, file_format, compress):
+    name = "-".join(kinds) if set(kinds) != set(KINDS) else "content"
+    extension = ".gz" if compress else ""
+    return f"yatube-{name}.{file_format}{extension}"
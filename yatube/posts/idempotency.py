@@ -0,0 +1,56 @@
+"""Хранилище ответов на запросы записи с заголовком Idempotency-Key.
+
+Ответ сохраняется в той же транзакции, что и созданные записи, поэтому
+повтор запроса (например, после обрыва соединения) получает исходный
+ответ, а не создаёт записи заново. Одновременный повтор упирается в
+уникальность ключа и откатывается целиком. Ключи хранятся
+IDEMPOTENCY_KEY_TTL секунд; просроченные удаляет команда
+purge_idempotency_keys.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from posts.models import IdempotencyKey
+
+
+def fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def lookup(user, key):
+    """Сохранённый ответ на ключ пользователя или None."""
+    return IdempotencyKey.objects.filter(
+        user=user, key=key, expires__gt=timezone.now()
+    ).first()
+
+
+def remember(user, key, fingerprint, status, body):
+    now = timezone.now()
+    # Просроченная запись с тем же ключом не должна мешать новой.
+    IdempotencyKey.objects.filter(
+        user=user, key=key, expires__lte=now
+    ).delete()
+    return IdempotencyKey.objects.create(
+        user=user,
+        key=key,
+        fingerprint=fingerprint,
+        status=status,
+        body=body,
+        expires=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+
+
+def purge():
+    """Удаляет просроченные ключи; возвращает их число."""
+    deleted, _ = IdempotencyKey.objects.filter(
+        expires__lte=timezone.now()
+    ).delete()
+    return deleted
@@ -0,0 +1,334 @@
+"""Потоковая загрузка постов, комментариев и подписок из архива.
+
+Записи читаются генераторами по одной строке (NDJSON или CSV), собираются
+в порции по transaction_size и записываются многострочными INSERT пачками
+по batch_size, каждая порция -- в своей транзакции. Авторы и группы
+находятся по словарям в памяти, которые пополняются одним запросом на
+порцию, поэтому память не растёт с размером архива.
+
+Формат записей (поле type задаёт вид записи, в CSV его можно задать
+для всего файла):
+  post -- id (необязательно), author, group (slug), text, pub_date;
+  comment -- post (id поста), author, text, created;
+  follow -- user, author.
+Авторы задаются именами пользователей, даты -- в формате ISO 8601.
+
+Пакетная вставка не вызывает сигналы, поэтому после загрузки производные
+данные (счётчики, поисковый индекс, ленты подписок) пересчитываются
+функцией rebuild_derived.
+"""
+import csv
+import gzip
+import io
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import caching, search, stats, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+KINDS = ("post", "comment", "follow")
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def open_source(path):
+    """Текстовый поток файла; «-» -- стандартный ввод, .gz распаковывается."""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise InvalidRecord(f"Неверная дата: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+@contextmanager
+def archive_dates(*fields):
+    """Отключает auto_now_add у полей, чтобы bulk_create сохранил даты из
+    архива, и возвращает его на выходе. Метаданные модели общие для
+    процесса, поэтому загрузку не запускают рядом с обработкой запросов:
+    её выполняют команды import_content и benchmark_views."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+class Importer:
+    def __init__(
+        self,
+        batch_size=1000,
+        transaction_size=10000,
+        create_users=False,
+        kind=None,
+    ):
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.create_users = create_users
+        self.kind = kind
+        self.users = {}
+        self.groups = dict(Group.objects.values_list("slug", "id"))
+        self.created = dict.fromkeys(KINDS, 0)
+        self.skipped = 0
+        self.errors = []
+        # Ленты, кэш которых нужно сбросить после загрузки.
+        self.scopes = {caching.GLOBAL}
+
+    def _bulk_create(self, model, objects, **kwargs):
+        # Django 2.2 не ограничивает явный batch_size пределами базы
+        # (в SQLite -- не больше 500 строк в одном INSERT).
+        objects = list(objects)
+        limit = connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objects
+        )
+        model.objects.bulk_create(
+            objects, batch_size=min(self.batch_size, limit), **kwargs
+        )
+
+    def _resolve_users(self, usernames):
+        """Дополняет словарь users одним запросом на порцию записей."""
+        missing = set(usernames) - self.users.keys() - {""}
+        if not missing:
+            return
+        if self.create_users:
+            existing = set(
+                User.objects.filter(username__in=missing).values_list(
+                    "username", flat=True
+                )
+            )
+            self._bulk_create(
+                User,
+                (
+                    User(username=name, password=make_password(None))
+                    for name in missing - existing
+                ),
+                ignore_conflicts=True,
+            )
+        self.users.update(
+            User.objects.filter(username__in=missing).values_list(
+                "username", "id"
+            )
+        )
+
+    def _user(self, name):
+        try:
+            return self.users[name]
+        except KeyError:
+            raise InvalidRecord(f"Нет пользователя: {name}")
+
+    @staticmethod
+    def _text(record):
+        if not record.get("text"):
+            raise InvalidRecord("Пустой текст")
+        return record["text"]
+
+    def _post(self, record):
+        group_id = None
+        if record.get("group"):
+            try:
+                group_id = self.groups[record["group"]]
+            except KeyError:
+                raise InvalidRecord(f"Нет группы: {record['group']}")
+        post = Post(
+            author_id=self._user(record["author"]),
+            group_id=group_id,
+            text=self._text(record),
+            pub_date=_date(record.get("pub_date")),
+            updated=timezone.now(),
+        )
+        if record.get("id"):
+            post.pk = int(record["id"])
+        return post
+
+    def _comment(self, record, post_ids):
+        post_id = int(record["post"])
+        if post_id not in post_ids:
+            raise InvalidRecord(f"Нет поста: {post_id}")
+        return Comment(
+            post_id=post_id,
+            author_id=self._user(record["author"]),
+            text=self._text(record),
+            created=_date(record.get("created")),
+        )
+
+    def _follow(self, record):
+        user_id = self._user(record["user"])
+        author_id = self._user(record["author"])
+        if user_id == author_id:
+            raise InvalidRecord("Подписка на самого себя")
+        return Follow(user_id=user_id, author_id=author_id)
+
+    def _new_posts(self, posts):
+        """Посты, чьих id ещё нет в базе; остальные отклоняются."""
+        ids = [post.pk for post in posts if post.pk is not None]
+        taken = set(
+            Post.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+        new = []
+        for post in posts:
+            if post.pk in taken:
+                self._reject(post.pk, InvalidRecord("Пост уже загружен"))
+                continue
+            new.append(post)
+            if post.pk is not None:
+                taken.add(post.pk)
+        return new
+
+    @staticmethod
+    def _new_follows(follows):
+        """Подписки, которых ещё нет ни в базе, ни выше в порции."""
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={follow.user_id for follow in follows},
+                author_id__in={follow.author_id for follow in follows},
+            ).values_list("user_id", "author_id")
+        )
+        new = []
+        for follow in follows:
+            pair = (follow.user_id, follow.author_id)
+            if pair not in existing:
+                existing.add(pair)
+                new.append(follow)
+        return new
+
+    def _existing_posts(self, records, posts):
+        """id постов, на которые ссылаются комментарии порции."""
+        ids = set()
+        for record in records:
+            try:
+                ids.add(int(record["post"]))
+            except (KeyError, TypeError, ValueError):
+                pass  # такая запись будет отклонена в _comment
+        found = {post.pk for post in posts if post.pk in ids}
+        found.update(
+            Post.objects.filter(pk__in=ids - found).values_list(
+                "pk", flat=True
+            )
+        )
+        return found
+
+    def _build(self, chunk):
+        """Раскладывает порцию записей по видам и строит объекты моделей."""
+        by_kind = {kind: [] for kind in KINDS}
+        for record in chunk:
+            kind = self.kind or record.get("type")
+            if kind not in by_kind:
+                self._reject(record, f"Неизвестный вид записи: {kind}")
+                continue
+            by_kind[kind].append(record)
+        self._resolve_users(
+            name
+            for record in chunk
+            for name in (record.get("author"), record.get("user"))
+            if name
+        )
+        objects = {kind: [] for kind in KINDS}
+        for kind, build in (("post", self._post), ("follow", self._follow)):
+            for record in by_kind[kind]:
+                try:
+                    objects[kind].append(build(record))
+                except (InvalidRecord, KeyError, ValueError) as error:
+                    self._reject(record, error)
+        objects["post"] = self._new_posts(objects["post"])
+        post_ids = self._existing_posts(by_kind["comment"], objects["post"])
+        for record in by_kind["comment"]:
+            try:
+                objects["comment"].append(self._comment(record, post_ids))
+            except (InvalidRecord, KeyError, ValueError) as error:
+                self._reject(record, error)
+        return objects
+
+    def _reject(self, record, error):
+        self.skipped += 1
+        if len(self.errors) < 20:
+            self.errors.append(f"{error!r}: {record}")
+
+    def write(self, chunk):
+        objects = self._build(chunk)
+        with transaction.atomic(), archive_dates(
+            Post._meta.get_field("pub_date"),
+            Comment._meta.get_field("created"),
+        ):
+            self._bulk_create(Post, objects["post"])
+            self._bulk_create(Comment, objects["comment"])
+            # Уже существующие подписки не считаются созданными;
+            # ignore_conflicts -- на случай параллельной подписки.
+            objects["follow"] = self._new_follows(objects["follow"])
+            self._bulk_create(Follow, objects["follow"], ignore_conflicts=True)
+        for kind in KINDS:
+            self.created[kind] += len(objects[kind])
+        for post in objects["post"]:
+            self.scopes.update(caching.post_scopes(post))
+        for follow in objects["follow"]:
+            self.scopes.add(caching.follow_scope(follow.user_id))
+
+    def run(self, records, progress=None):
+        """Загружает записи порциями; progress(загружено) -- после каждой."""
+        done = 0
+        for chunk in chunks(records, self.transaction_size):
+            self.write(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done)
+        self._reset_sequences()
+
+    def _reset_sequences(self):
+        # После вставки с явными id последовательность PostgreSQL отстаёт.
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment, Follow]
+        )
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def rebuild_derived(self):
+        """Пересчитывает данные, которые обычно поддерживают сигналы."""
+        stats.rebuild_comment_counts()
+        stats.rebuild(batch_size=self.batch_size)
+        search.rebuild(batch_size=self.batch_size)
+        with transaction.atomic():
+            timeline.rebuild()
+        caching.bump(*self.scopes)
@@ -0,0 +1,234 @@
+"""Живые обновления лент и постов через server-sent events.
+
+Новые посты и комментарии публикуются в шину core.events после фиксации
+транзакции: пост -- в каналы общей ленты, автора и группы (имена те же,
+что у версий лент в posts.caching), комментарий -- в канал поста.
+
+stream() -- адрес /events/ ASGI-приложения (см. ASGI_ROUTES): подписывает
+клиента на каналы одной ленты и сообщает, сколько пришло новых постов или
+комментариев, копя события LIVE_EVENTS_DEBOUNCE секунд. Страницу целиком
+браузер перерисовывает, только когда пользователь этого захочет.
+Лента задаётся параметром: ?feed=index, ?group=<slug>,
+?author=<username>, ?post=<id> или ?follow=1 (подписки пользователя,
+чья сессия в cookie).
+"""
+import asyncio
+import json
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import transaction
+from django.http import parse_cookie
+
+from core import events
+from posts import caching
+from posts.models import Follow, Group, Post, User
+
+HEADERS = [
+    (b"Content-Type", b"text/event-stream; charset=utf-8"),
+    (b"Cache-Control", b"no-cache"),
+    # Прокси (nginx) не должен копить поток в буфере.
+    (b"X-Accel-Buffering", b"no"),
+]
+RETRY = 5000
+
+
+def post_channel(post_id):
+    return f"post:{post_id}"
+
+
+def _publish_later(messages):
+    def publish():
+        for channel, event in messages:
+            events.publish(channel, event)
+
+    transaction.on_commit(publish)
+
+
+def publish_posts(posts):
+    """Сообщает лентам о новых постах после фиксации транзакции."""
+    _publish_later(
+        [
+            (scope, {"post": post.pk})
+            for post in posts
+            for scope in caching.post_scopes(post)
+        ]
+    )
+
+
+def publish_comments(comments):
+    _publish_later(
+        [
+            (
+                post_channel(comment.post_id),
+                {"comment": comment.pk, "post": comment.post_id},
+            )
+            for comment in comments
+        ]
+    )
+
+
+def _user(cookies):
+    session_key = parse_cookie(cookies).get(settings.SESSION_COOKIE_NAME)
+    if not session_key:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    # get_user проверяет и хеш пароля в сессии, как при обычном запросе.
+    user = auth.get_user(
+        SimpleNamespace(session=engine.SessionStore(session_key))
+    )
+    return user if user.is_authenticated else None
+
+
+def _feed(value, cookies):
+    return [caching.GLOBAL] if value == "index" else None
+
+
+def _group(slug, cookies):
+    group_id = Group.objects.filter(slug=slug).values_list("pk", flat=True)
+    return [caching.group_scope(pk) for pk in group_id] or None
+
+
+def _author(username, cookies):
+    user_id = User.objects.filter(username=username).values_list(
+        "pk", flat=True
+    )
+    return [caching.author_scope(pk) for pk in user_id] or None
+
+
+def _post(post_id, cookies):
+    if not post_id.isdigit() or not Post.objects.filter(pk=post_id).exists():
+        return None
+    return [post_channel(post_id)]
+
+
+def _follow(value, cookies):
+    user = _user(cookies)
+    if user is None:
+        return None
+    authors = Follow.objects.filter(user=user).values_list(
+        "author_id", flat=True
+    )
+    return [caching.author_scope(author_id) for author_id in authors]
+
+
+RESOLVERS = {
+    "feed": _feed,
+    "group": _group,
+    "author": _author,
+    "post": _post,
+    "follow": _follow,
+}
+
+
+def channels(query, cookies=""):
+    """Каналы ленты из параметров запроса; None, если ленты нет."""
+    for name, resolve in RESOLVERS.items():
+        if query.get(name):
+            return resolve(query[name], cookies)
+    return None
+
+
+def encode(name, data):
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"event: {name}\ndata: {payload}\n\n".encode()
+
+
+def summary(received, lost=0):
+    """Сообщения SSE о пачке событий: сколько постов и комментариев."""
+    posts = {event["post"] for _, event in received if "comment" not in event}
+    comments = [event for _, event in received if "comment" in event]
+    messages = b""
+    if posts:
+        messages += encode("posts", {"count": len(posts)})
+    if comments:
+        messages += encode(
+            "comments",
+            {
+                "count": len(comments),
+                "posts": sorted({event["post"] for event in comments}),
+            },
+        )
+    if lost:
+        # Часть событий потеряна: страницу лучше просто обновить.
+        messages += encode("stale", {"lost": lost})
+    return messages
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _next_message(subscription, disconnected):
+    """Сводка по следующей пачке событий или пинг, если событий не было."""
+    getter = asyncio.ensure_future(subscription.get())
+    done, _ = await asyncio.wait(
+        {getter, disconnected},
+        timeout=settings.LIVE_EVENTS_HEARTBEAT,
+        return_when=asyncio.FIRST_COMPLETED,
+    )
+    if getter not in done:
+        getter.cancel()
+        return b": ping\n\n"
+    received = [getter.result()]
+    await asyncio.sleep(settings.LIVE_EVENTS_DEBOUNCE)
+    while not subscription.queue.empty():
+        received.append(subscription.queue.get_nowait())
+    lost, subscription.lost = subscription.lost, 0
+    return summary(received, lost)
+
+
+async def _not_found(send):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 404,
+            "headers": [(b"Content-Type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send(
+        {"type": "http.response.body", "body": "Лента не найдена".encode()}
+    )
+
+
+async def stream(handler, scope, receive, send):
+    query = {
+        name: values[0]
+        for name, values in parse_qs(
+            scope.get("query_string", b"").decode("latin-1")
+        ).items()
+    }
+    cookies = dict(scope.get("headers", ())).get(b"cookie", b"")
+    found = await handler.run(channels, query, cookies.decode("latin-1"))
+    if found is None:
+        return await _not_found(send)
+    subscription = events.get_broker().subscribe(found)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send(
+            {"type": "http.response.start", "status": 200, "headers": HEADERS}
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": f"retry: {RETRY}\n\n".encode(),
+                "more_body": True,
+            }
+        )
+        while not disconnected.done():
+            message = await _next_message(subscription, disconnected)
+            if message and not disconnected.done():
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": message,
+                        "more_body": True,
+                    }
+                )
+    finally:
+        subscription.close()
+        disconnected.cancel()
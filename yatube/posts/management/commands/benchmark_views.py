@@ -0,0 +1,147 @@
+import json
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет тестовую базу и замеряет задержку страниц лент: "
+        "p50/p95/p99, запросы к базе на страницу и пиковый RSS. "
+        "Рабочая база не затрагивается"
+    )
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.VOLUMES.items():
+            parser.add_argument(
+                f"--{name}",
+                type=int,
+                default=default,
+                help=f"Сколько создать: {name}",
+            )
+        parser.add_argument(
+            "--driver",
+            choices=("client", "wsgi", "asgi"),
+            default="client",
+            help="Тестовый клиент или локальный WSGI- или ASGI-сервер",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help=(
+                "Потоков-обработчиков у сервера (по умолчанию у WSGI -- "
+                "поток на соединение, у ASGI -- ASGI_THREADS)"
+            ),
+        )
+        parser.add_argument(
+            "--slow-clients",
+            type=int,
+            default=0,
+            help=(
+                "Сколько медленных соединений держать открытыми во время "
+                "замера (только для --driver wsgi и asgi)"
+            ),
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Сколько запросов в каждом сценарии",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            help="Замерять только этот сценарий (можно повторять)",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--baseline",
+            help=(
+                "Файл эталона (например, benchmark_baseline.json): при "
+                "регрессии команда завершится ошибкой"
+            ),
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Допустимый рост p95 относительно эталона (доля)",
+        )
+        parser.add_argument(
+            "--save-baseline", help="Сохранить результат как эталон"
+        )
+
+    def handle(self, *args, **options):
+        if options["slow_clients"] and options["driver"] == "client":
+            raise CommandError("--slow-clients нужен сервер: wsgi или asgi")
+        volumes = {name: options[name] for name in benchmark.VOLUMES}
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        databases = runner.setup_databases()
+        try:
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                DEBUG=False,
+                MEDIA_ROOT=media,
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            ):
+                started = time.monotonic()
+                benchmark.seed(volumes, seed=options["seed"])
+                self.stdout.write(
+                    f"База заполнена за {time.monotonic() - started:.1f} с"
+                )
+                report = benchmark.run(
+                    driver=options["driver"],
+                    requests=options["requests"],
+                    concurrency=options["concurrency"],
+                    only=options["scenario"],
+                    workers=options["workers"],
+                    slow_clients=options["slow_clients"],
+                )
+        finally:
+            runner.teardown_databases(databases)
+        self.write_report(report)
+        if options["save_baseline"]:
+            with open(options["save_baseline"], "w") as file:
+                json.dump(
+                    {
+                        name: {
+                            key: round(value, 2)
+                            for key, value in result.items()
+                        }
+                        for name, result in report.items()
+                    },
+                    file,
+                    indent=2,
+                    sort_keys=True,
+                )
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            regressions = benchmark.compare(
+                report, baseline, options["tolerance"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Регрессия относительно эталона:\n"
+                    + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет"))
+
+    def write_report(self, report):
+        self.stdout.write(
+            f"{'Сценарий':<14}{'запр/с':>8}{'p50':>8}{'p95':>8}{'p99':>8}"
+            f"{'SQL':>6}{'ошибок':>8}{'RSS, МБ':>9}"
+        )
+        for name, result in report.items():
+            self.stdout.write(
+                f"{name:<14}{result['rps']:>8.0f}{result['p50']:>8.1f}"
+                f"{result['p95']:>8.1f}{result['p99']:>8.1f}"
+                f"{result['queries']:>6.1f}{result['errors']:>8}"
+                f"{result['rss']:>9.0f}"
+            )
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import exporting
+from posts.importing import KINDS
+
+
+class Command(BaseCommand):
+    help = "Выгружает посты, комментарии и подписки в NDJSON или CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="Файл для выгрузки; по умолчанию -- стандартный вывод",
+        )
+        parser.add_argument(
+            "--type",
+            action="append",
+            choices=KINDS,
+            help="Вид записей; можно указать несколько раз (по умолчанию все)",
+        )
+        parser.add_argument(
+            "--format", choices=tuple(exporting.FORMATS), default="ndjson"
+        )
+        parser.add_argument(
+            "--gzip", action="store_true", help="Сжимать выгрузку gzip"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Сколько строк читать из базы за раз",
+        )
+
+    def handle(self, *args, **options):
+        chunks = exporting.stream(
+            kinds=options["type"] or KINDS,
+            file_format=options["format"],
+            compress=options["gzip"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"] == "-":
+            output = getattr(self.stdout, "buffer", None) or sys.stdout.buffer
+            for chunk in chunks:
+                output.write(chunk)
+            output.flush()
+            return
+        with open(options["output"], "wb") as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(
+            self.style.SUCCESS(f"Выгрузка записана в {options['output']}")
+        )
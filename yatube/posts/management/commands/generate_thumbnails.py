@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Ставит в очередь подготовку миниатюр постов с картинками, для "
+        "которых варианты ещё не готовы (--all -- для всех)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Подготовить заново миниатюры всех постов с картинками",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image="").only("id", "image")
+        if not options["all"]:
+            posts = posts.filter(image_variants="")
+        queued = 0
+        for post in posts.iterator():
+            thumbnails.enqueue(post)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f"В очереди постов: {queued}"))
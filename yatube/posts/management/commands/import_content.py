@@ -0,0 +1,90 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importing
+
+
+class Command(BaseCommand):
+    help = "Загружает посты, комментарии и подписки из NDJSON или CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Файл с записями (.gz -- сжатый, «-» -- stdin)"
+        )
+        parser.add_argument(
+            "--format",
+            choices=("ndjson", "csv"),
+            help="Формат файла; по умолчанию определяется по расширению",
+        )
+        parser.add_argument(
+            "--type",
+            choices=importing.KINDS,
+            help="Вид всех записей файла, если в них нет поля type",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько записей вставлять одним запросом",
+        )
+        parser.add_argument(
+            "--transaction-size",
+            type=int,
+            default=10000,
+            help="Сколько записей записывать в одной транзакции",
+        )
+        parser.add_argument(
+            "--create-users",
+            action="store_true",
+            help="Создавать отсутствующих пользователей без пароля",
+        )
+        parser.add_argument(
+            "--skip-rebuild",
+            action="store_true",
+            help="Не пересчитывать счётчики, поиск и ленты после загрузки",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        name = path[:-3] if path.endswith(".gz") else path
+        file_format = options["format"] or (
+            "csv" if name.endswith(".csv") else "ndjson"
+        )
+        importer = importing.Importer(
+            batch_size=options["batch_size"],
+            transaction_size=options["transaction_size"],
+            create_users=options["create_users"],
+            kind=options["type"],
+        )
+        started = time.monotonic()
+
+        def progress(done):
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(
+                f"Обработано {done} записей, {rate:.0f} в секунду"
+            )
+
+        try:
+            with importing.open_source(path) as stream:
+                reader = getattr(importing, f"read_{file_format}")
+                importer.run(reader(stream), progress=progress)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Не удалось прочитать {path}: {error}")
+        elapsed = time.monotonic() - started
+        total = sum(importer.created.values())
+        for error in importer.errors:
+            self.stderr.write(error)
+        if not options["skip_rebuild"]:
+            self.stdout.write("Пересчёт счётчиков, поиска и лент...")
+            importer.rebuild_derived()
+        created = ", ".join(
+            f"{kind}: {count}" for kind, count in importer.created.items()
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Загружено {total} записей ({created}), пропущено "
+                f"{importer.skipped} за {elapsed:.1f} с, "
+                f"{total / max(elapsed, 1e-9):.0f} записей в секунду"
+            )
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import api_writes
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Выпускает пользователю токен для записи через API. Прежний токен "
+        "перестаёт действовать"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Нет пользователя: {options['username']}")
+        self.stdout.write(api_writes.issue_token(user))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import idempotency
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные ответы на запросы с Idempotency-Key"
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge()
+        self.stdout.write(self.style.SUCCESS(f"Удалено ключей: {deleted}"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики постов, комментариев и подписок авторов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько записей вставлять одним запросом",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = stats.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Пересчитана статистика {rebuilt} авторов")
+        )
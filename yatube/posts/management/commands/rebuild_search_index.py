@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Заново строит полнотекстовый индекс постов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Сколько постов индексировать за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Проиндексировано постов: {indexed}")
+        )
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+
+    def grouped(model, field):
+        return dict(
+            model.objects.order_by().values_list(field)
+            .annotate(total=Count('pk')).values_list(field, 'total')
+        )
+
+    posts = grouped(Post, 'author_id')
+    comments = grouped(Comment, 'author_id')
+    followers = grouped(Follow, 'author_id')
+    following = grouped(Follow, 'user_id')
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(
+                user_id=user_id,
+                posts=posts.get(user_id, 0),
+                comments=comments.get(user_id, 0),
+                followers=followers.get(user_id, 0),
+                following=following.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'статистику автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
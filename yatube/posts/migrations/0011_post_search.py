@@ -0,0 +1,53 @@
+from django.db import migrations
+
+from posts.stemming import stems
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    Post = apps.get_model('posts', 'Post')
+    rows = Post.objects.order_by('pk').values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                'CREATE VIRTUAL TABLE posts_post_search '
+                'USING fts5(text, tokenize = "unicode61")'
+            )
+            cursor.executemany(
+                'INSERT INTO posts_post_search (rowid, text) VALUES (%s, %s)',
+                (
+                    (pk, ' '.join(stems(text)))
+                    for pk, text in rows.iterator()
+                ),
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'CREATE TABLE posts_post_search ('
+                'post_id integer PRIMARY KEY REFERENCES posts_post (id) '
+                'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                'CREATE INDEX posts_post_search_document_idx '
+                'ON posts_post_search USING GIN (document)'
+            )
+            cursor.execute(
+                'INSERT INTO posts_post_search (post_id, document) '
+                "SELECT id, to_tsvector('russian', text) FROM posts_post"
+            )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE posts_post_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_post_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name='Отпечаток запроса')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('body', models.TextField(verbose_name='Тело ответа')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата запроса')),
+                ('expires', models.DateTimeField(db_index=True, verbose_name='Хранить до')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+            },
+        ),
+        migrations.CreateModel(
+            name='ApiToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key_hash', models.CharField(max_length=64, unique=True, verbose_name='Хеш ключа')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата выпуска')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='api_token', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'токен API',
+                'verbose_name_plural': 'Токены API',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
@@ -31,6 +31,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         verbose_name="Дата публикации", auto_now_add=True
     )
+    # Меняется и при правке поста, и при изменениях, видимых в карточке
+    # (комментарии, готовые миниатюры); по нему строится Last-Modified.
+    updated = models.DateTimeField("Дата изменения", auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -47,6 +50,12 @@ class Post(models.Model):
         help_text="Группа, к которой будет относиться пост",
     )
     image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    comments_count = models.PositiveIntegerField(
+        "Число комментариев", default=0, editable=False
+    )
+    image_variants = models.TextField(
+        "Размеры картинки", blank=True, default="", editable=False
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -57,6 +66,26 @@ class Post(models.Model):
     class Meta:
         ordering = ("-pub_date",)
         get_latest_by = "pub_date"
+        # Индексы под сортировку лент index, group_list и profile
+        indexes = [
+            models.Index(fields=["-pub_date", "-id"], name="post_feed_idx"),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_feed_idx",
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_feed_idx",
+            ),
+            # MAX(updated) для условных GET-запросов к лентам
+            models.Index(fields=["updated"], name="post_updated_idx"),
+            models.Index(
+                fields=["group", "updated"], name="post_group_updated_idx"
+            ),
+            models.Index(
+                fields=["author", "updated"], name="post_author_updated_idx"
+            ),
+        ]
         verbose_name = "публикацию"
         verbose_name_plural = "Публикации"
 
@@ -82,6 +111,14 @@ class Comment(models.Model):
         return self.text
 
     class Meta:
+        ordering = ("created", "id")
+        # Индекс под постраничный вывод комментариев поста
+        indexes = [
+            models.Index(
+                fields=["post", "created", "id"],
+                name="comment_post_created_idx",
+            )
+        ]
         verbose_name = "комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -99,5 +136,103 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"
+            )
+        ]
         verbose_name = "подписку"
         verbose_name_plural = "Подписки"
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, доставленный подписчику."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ("-pub_date", "-post_id")
+        unique_together = ("user", "post")
+        indexes = [models.Index(fields=["user", "-pub_date", "-post"])]
+        verbose_name = "запись ленты"
+        verbose_name_plural = "Ленты подписок"
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, которые поддерживаются при каждой записи."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    posts = models.PositiveIntegerField("Постов", default=0)
+    comments = models.PositiveIntegerField("Комментариев", default=0)
+    followers = models.PositiveIntegerField("Подписчиков", default=0)
+    following = models.PositiveIntegerField("Подписок", default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+    class Meta:
+        verbose_name = "статистику автора"
+        verbose_name_plural = "Статистика авторов"
+
+
+class ApiToken(models.Model):
+    """Токен для записи через API; хранится только хеш ключа."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="api_token",
+    )
+    key_hash = models.CharField("Хеш ключа", max_length=64, unique=True)
+    created = models.DateTimeField("Дата выпуска", auto_now_add=True)
+
+    def __str__(self):
+        return str(self.user_id)
+
+    class Meta:
+        verbose_name = "токен API"
+        verbose_name_plural = "Токены API"
+
+
+class IdempotencyKey(models.Model):
+    """Сохранённый ответ на запрос записи с заголовком Idempotency-Key."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="idempotency_keys",
+    )
+    key = models.CharField("Ключ", max_length=255)
+    # Хеш метода, пути и тела: тот же ключ с другим запросом -- ошибка.
+    fingerprint = models.CharField("Отпечаток запроса", max_length=64)
+    status = models.PositiveSmallIntegerField("Код ответа")
+    body = models.TextField("Тело ответа")
+    created = models.DateTimeField("Дата запроса", auto_now_add=True)
+    expires = models.DateTimeField("Хранить до", db_index=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key"
+            )
+        ]
+        verbose_name = "ключ идемпотентности"
+        verbose_name_plural = "Ключи идемпотентности"
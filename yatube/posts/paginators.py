@@ -0,0 +1,163 @@
+import base64
+import json
+from collections.abc import Sequence
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(direction, values):
+    """Курсор -- направление и значения ключа сортировки крайней записи."""
+    raw = json.dumps([direction] + [str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if direction not in ("next", "previous"):
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (keyset pagination).
+
+    Вместо COUNT(*) и OFFSET каждая страница выбирается условием на пару
+    полей сортировки относительно крайней записи предыдущей страницы,
+    поэтому время выборки не зависит от глубины страницы.
+    """
+
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, ordering=("-pub_date", "-id")):
+        descending = {field.startswith("-") for field in ordering}
+        if len(ordering) != 2 or len(descending) != 1:
+            raise ValueError(
+                "Нужны два поля сортировки с одинаковым направлением"
+            )
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.descending = descending.pop()
+        self.fields = tuple(field.lstrip("-") for field in ordering)
+
+    def _field(self, name):
+        # Сортировать можно и по аннотации, например по релевантности.
+        annotations = self.object_list.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        try:
+            return [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(values)
+
+    def _seek(self, values, forward):
+        """Условие «строго после» (или «строго до») записи с ключом values."""
+        first, second = self.fields
+        lookup = "lt" if self.descending == forward else "gt"
+        # Нестрогое условие на первое поле позволяет базе начать чтение
+        # индекса сразу с нужного места, а не отбрасывать записи с начала.
+        return Q(**{f"{first}__{lookup}e": values[0]}) & (
+            Q(**{f"{first}__{lookup}": values[0]})
+            | Q(**{first: values[0], f"{second}__{lookup}": values[1]})
+        )
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        )
+
+    def key(self, obj):
+        # Записи могут быть и словарями из .values().
+        if isinstance(obj, dict):
+            return [obj[name] for name in self.fields]
+        return [getattr(obj, name) for name in self.fields]
+
+    def page(self, cursor=None):
+        direction, values = "next", None
+        if cursor:
+            try:
+                direction, raw_values = decode_cursor(cursor)
+                values = self._parse_values(raw_values)
+            except InvalidCursor:
+                direction, values = "next", None
+        forward = direction == "next"
+        queryset = self.object_list.order_by(
+            *(self.ordering if forward else self._reversed_ordering())
+        )
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        items = list(queryset[: self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[: self.per_page]
+        if forward:
+            has_next, has_previous = has_more, values is not None
+        else:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        return CursorPage(items, self, has_next, has_previous, cursor or "")
+
+
+class CursorPage(Sequence):
+    def __init__(
+        self, object_list, paginator, has_next, has_previous, cursor
+    ):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_next = has_next
+        self._has_previous = has_previous
+        # Ключи крайних записей запоминаются сразу: object_list можно
+        # заменить, например, подгруженными по id постами.
+        self._keys = (
+            (paginator.key(object_list[0]), paginator.key(object_list[-1]))
+            if object_list
+            else (None, None)
+        )
+
+    def __repr__(self):
+        # Используется как часть ключа фрагментного кэша шаблонов.
+        return "<Cursor page %r>" % self.cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and self._keys[1] is not None
+
+    def has_previous(self):
+        return self._has_previous and self._keys[0] is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return ""
+        return encode_cursor("next", self._keys[1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return ""
+        return encode_cursor("previous", self._keys[0])
@@ -0,0 +1,171 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс -- отдельная таблица posts_post_search: в SQLite это таблица FTS5
+с основами слов текста (posts.stemming), в PostgreSQL -- столбец tsvector
+с русским словарём и GIN-индексом. Индекс обновляется сигналами при
+создании, правке и удалении поста. На других базах поиск работает через
+LIKE по каждому слову запроса.
+"""
+from django.db import connection, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from posts import stemming
+from posts.models import Post
+
+TABLE = "posts_post_search"
+CONFIG = "russian"
+
+# Порядок результатов: сначала самые релевантные, при равной
+# релевантности -- по id. bm25 в SQLite тем меньше, чем лучше совпадение.
+SQLITE_ORDERING = ("rank", "id")
+POSTGRES_ORDERING = ("-rank", "-id")
+FALLBACK_ORDERING = ("-pub_date", "-id")
+
+
+def document(text):
+    """Текст поста в том виде, в котором он хранится в индексе SQLite."""
+    return " ".join(stemming.stems(text))
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы слов запроса, каждая в кавычках."""
+    return " ".join(f'"{stem}"' for stem in stemming.stems(query))
+
+
+def supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+def _index(rows):
+    """Добавляет или заменяет записи индекса для пар (id поста, текст)."""
+    rows = list(rows)
+    if not rows or not supported():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(
+                f"DELETE FROM {TABLE} WHERE rowid = %s",
+                [(post_id,) for post_id, _ in rows],
+            )
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)",
+                [(post_id, document(text)) for post_id, text in rows],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (post_id, document) "
+                f"VALUES (%s, to_tsvector('{CONFIG}', %s)) "
+                "ON CONFLICT (post_id) "
+                "DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def index_post(post):
+    _index([(post.pk, post.text)])
+
+
+def index_posts(posts):
+    _index((post.pk, post.text) for post in posts)
+
+
+def remove_post(post_id):
+    if not supported():
+        return
+    column = "rowid" if connection.vendor == "sqlite" else "post_id"
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE {column} = %s", [post_id])
+
+
+class _Ids(RawSQL):
+    """Подзапрос id для lookup __in.
+
+    Lookup сам берёт подзапрос в скобки, а вторые скобки от RawSQL
+    превратили бы его в скалярный подзапрос с одной строкой.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def _sqlite_rank(match):
+    return RawSQL(
+        f"SELECT bm25({TABLE}) FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND rowid = {Post._meta.db_table}.id",
+        [match],
+        output_field=FloatField(),
+    )
+
+
+def _postgres_rank(query):
+    # ts_rank возвращает real; double precision точно переживает курсор.
+    return RawSQL(
+        f"SELECT ts_rank(document, plainto_tsquery('{CONFIG}', %s))"
+        f"::double precision FROM {TABLE} "
+        f"WHERE post_id = {Post._meta.db_table}.id",
+        [query],
+        output_field=FloatField(),
+    )
+
+
+def matching(query):
+    """Условие для filter(): посты, подходящие под запрос."""
+    if connection.vendor == "sqlite":
+        return Q(
+            pk__in=_Ids(
+                f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s",
+                [match_expression(query)],
+            )
+        )
+    if connection.vendor == "postgresql":
+        return Q(
+            pk__in=_Ids(
+                f"SELECT post_id FROM {TABLE} WHERE document @@ "
+                f"plainto_tsquery('{CONFIG}', %s)",
+                [query],
+            )
+        )
+    condition = Q()
+    for word in stemming.words(query):
+        condition &= Q(text__icontains=word)
+    return condition
+
+
+def search(query):
+    """Выборка найденных постов с полем rank и порядок её сортировки.
+
+    Пустой запрос (без единого слова) ничего не находит.
+    """
+    posts = Post.objects.select_related("author", "group")
+    no_rank = Value(0.0, output_field=FloatField())
+    if not stemming.words(query):
+        return posts.none().annotate(rank=no_rank), FALLBACK_ORDERING
+    posts = posts.filter(matching(query))
+    if connection.vendor == "sqlite":
+        rank = _sqlite_rank(match_expression(query))
+        return posts.annotate(rank=rank), SQLITE_ORDERING
+    if connection.vendor == "postgresql":
+        return posts.annotate(rank=_postgres_rank(query)), POSTGRES_ORDERING
+    return posts.annotate(rank=no_rank), FALLBACK_ORDERING
+
+
+def rebuild(batch_size=1000):
+    """Заполняет индекс заново по всем постам, пачками по batch_size."""
+    if not supported():
+        return 0
+    rows = Post.objects.order_by("pk").values_list("pk", "text")
+    indexed = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _index(batch)
+                indexed += len(batch)
+                batch = []
+        _index(batch)
+        indexed += len(batch)
+    return indexed
@@ -0,0 +1,105 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import tasks
+from posts import caching, live, search, stats, thumbnails, timeline
+from posts.models import Comment, Follow, Post
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    # При переносе поста в другую группу устаревает и лента прежней группы.
+    instance._previous_group_id = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list("group_id", flat=True)
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Post)
+def deliver_post(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, posts=1)
+        tasks.enqueue("posts.fan_out", post=instance.pk)
+        live.publish_posts([instance])
+    tasks.enqueue("posts.index", key=str(instance.pk), post=instance.pk)
+    thumbnails.enqueue(instance)
+    scopes = caching.post_scopes(instance)
+    previous_group_id = getattr(instance, "_previous_group_id", None)
+    if previous_group_id and previous_group_id != instance.group_id:
+        scopes.append(caching.group_scope(previous_group_id))
+    caching.bump(*scopes)
+    if not created:
+        timeline.changed(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def remove_deleted_post(sender, instance, **kwargs):
+    stats.decrement(instance.author_id, posts=1)
+    search.remove_post(instance.pk)
+    caching.bump(*caching.post_scopes(instance))
+    timeline.changed(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        stats.increment(instance.author_id, followers=1)
+        stats.increment(instance.user_id, following=1)
+        tasks.enqueue(
+            "posts.backfill", user=instance.user_id, author=instance.author_id
+        )
+        caching.bump(caching.follow_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    stats.decrement(instance.author_id, followers=1)
+    stats.decrement(instance.user_id, following=1)
+    timeline.prune(instance.user_id, instance.author_id)
+    caching.bump(caching.follow_scope(instance.user_id))
+    if timeline.just_demoted(instance.author_id):
+        # Посты, опубликованные, пока автор был «знаменитостью», в ленты
+        # не раскладывались, а теперь перестанут подмешиваться при чтении.
+        followers = Follow.objects.filter(
+            author_id=instance.author_id
+        ).values_list("user_id", flat=True)
+        tasks.enqueue_many(
+            "posts.backfill",
+            (
+                {"user": user_id, "author": instance.author_id}
+                for user_id in followers.iterator()
+            ),
+        )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F("comments_count") + 1, updated=timezone.now()
+        )
+        stats.increment(instance.author_id, comments=1)
+        caching.bump(*caching.post_scopes(instance.post))
+        timeline.changed(instance.post.author_id)
+        live.publish_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F("comments_count") - 1, updated=timezone.now()
+    )
+    stats.decrement(instance.author_id, comments=1)
+    post = (
+        Post.objects.filter(pk=instance.post_id)
+        .only("author_id", "group_id")
+        .first()
+    )
+    if post is not None:
+        caching.bump(*caching.post_scopes(post))
+        timeline.changed(post.author_id)
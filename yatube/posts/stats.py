@@ -0,0 +1,97 @@
+"""Денормализованные счётчики авторов (AuthorStats).
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 при создании и
+удалении постов, комментариев и подписок, поэтому страницы не считают
+посты автора заново. Расхождения исправляет команда rebuild_author_stats.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import AuthorStats, Comment, Follow, Post, User
+
+COUNTERS = ("posts", "comments", "followers", "following")
+
+
+def increment(user_id, **deltas):
+    """Увеличивает счётчики пользователя, создавая запись при её отсутствии."""
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if AuthorStats.objects.filter(user_id=user_id).update(**changes):
+        return
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=user_id)], ignore_conflicts=True
+    )
+    AuthorStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def decrement(user_id, **deltas):
+    """Уменьшает счётчики, не опускаясь ниже нуля."""
+    for name, delta in deltas.items():
+        AuthorStats.objects.filter(
+            user_id=user_id, **{f"{name}__gte": delta}
+        ).update(**{name: F(name) - delta})
+
+
+def for_user(user):
+    """Счётчики пользователя; для нового пользователя -- нулевые."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return AuthorStats(user=user)
+
+
+def _grouped_counts(queryset, field):
+    return dict(
+        queryset.order_by()
+        .values_list(field)
+        .annotate(total=Count("pk"))
+        .values_list(field, "total")
+    )
+
+
+def rebuild(batch_size=1000):
+    """Пересчитывает счётчики всех пользователей с нуля.
+
+    Каждый счётчик считается одним агрегирующим запросом по всей таблице,
+    записи заменяются пачками внутри одной транзакции.
+    """
+    totals = {
+        "posts": _grouped_counts(Post.objects, "author_id"),
+        "comments": _grouped_counts(Comment.objects, "author_id"),
+        "followers": _grouped_counts(Follow.objects, "author_id"),
+        "following": _grouped_counts(Follow.objects, "user_id"),
+    }
+    user_ids = User.objects.order_by("pk").values_list("pk", flat=True)
+    with transaction.atomic():
+        AuthorStats.objects.all().delete()
+        batch = []
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            batch.append(
+                AuthorStats(
+                    user_id=user_id,
+                    **{
+                        name: totals[name].get(user_id, 0)
+                        for name in COUNTERS
+                    },
+                )
+            )
+            if len(batch) >= batch_size:
+                AuthorStats.objects.bulk_create(batch)
+                rebuilt += len(batch)
+                batch = []
+        AuthorStats.objects.bulk_create(batch)
+        rebuilt += len(batch)
+    return rebuilt
+
+
+def rebuild_comment_counts():
+    """Пересчитывает Post.comments_count одним UPDATE с подзапросом."""
+    counts = (
+        Comment.objects.filter(post=OuterRef("pk"))
+        .order_by()
+        .values("post")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Post.objects.update(comments_count=Coalesce(Subquery(counts), 0))
@@ -0,0 +1,130 @@
+"""Выделение основы русских слов для поискового индекса.
+
+Упрощённая реализация алгоритма Snowball (Портера) для русского языка:
+окончания отрезаются только в области RV -- после первой гласной.
+"""
+import re
+
+VOWELS = "аеиоуыэюя"
+
+# Группы окончаний: первые отрезаются только после «а» или «я».
+PERFECTIVE_GERUND = (
+    "в вши вшись".split(),
+    "ив ивши ившись ыв ывши ывшись".split(),
+)
+REFLEXIVE = ((), "ся сь".split())
+ADJECTIVE = (
+    (),
+    "ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому их ых ую "
+    "юю ая яя ою ею".split(),
+)
+PARTICIPLE = ("ем нн вш ющ щ".split(), "ивш ывш ующ".split())
+VERB = (
+    "ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно".split(),
+    "ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено ят "
+    "ует уют ит ыт ены ить ыть ишь ую ю".split(),
+)
+NOUN = (
+    (),
+    "а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем ам "
+    "ом о у ах иях ях ы ь ию ью ю ия ья я".split(),
+)
+SUPERLATIVE = ((), "ейш ейше".split())
+DERIVATIONAL = ("ость", "ост")
+
+
+def _cut(part, endings):
+    """Отрезает самое длинное окончание из групп endings.
+
+    Окончания первой группы отрезаются только после «а» или «я». Если
+    самое длинное подходящее окончание не прошло эту проверку, более
+    короткие не пробуются -- как в алгоритме Snowball.
+    """
+    after_a, anywhere = endings
+    candidates = [(ending, True) for ending in after_a]
+    candidates += [(ending, False) for ending in anywhere]
+    matched = [item for item in candidates if part.endswith(item[0])]
+    if not matched:
+        return None
+    ending, needs_a = max(matched, key=lambda item: len(item[0]))
+    stem = part[: -len(ending)]
+    if needs_a and not stem.endswith(("а", "я")):
+        return None
+    return stem
+
+
+def _regions(word):
+    """Начала областей RV и R2 (см. описание алгоритма Snowball)."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r1 = r2 = len(word)
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _inflection(part):
+    """Шаг 1: деепричастие, иначе возвратная частица и окончание
+    прилагательного (причастия), глагола или существительного."""
+    result = _cut(part, PERFECTIVE_GERUND)
+    if result is not None:
+        return result
+    reflexive = _cut(part, REFLEXIVE)
+    if reflexive is not None:
+        part = reflexive
+    result = _cut(part, ADJECTIVE)
+    if result is not None:
+        participle = _cut(result, PARTICIPLE)
+        return result if participle is None else participle
+    for endings in (VERB, NOUN):
+        result = _cut(part, endings)
+        if result is not None:
+            return result
+    return part
+
+
+def _tidy_up(part):
+    """Шаг 4: превосходная степень, двойное «н» и мягкий знак."""
+    superlative = _cut(part, SUPERLATIVE)
+    if superlative is not None:
+        part = superlative
+    if part.endswith("нн"):
+        return part[:-1]
+    if superlative is None and part.endswith("ь"):
+        return part[:-1]
+    return part
+
+
+def stem(word):
+    """Основа слова; слова не на кириллице возвращаются без изменений."""
+    word = word.lower().replace("ё", "е")
+    if not re.search("[а-я]", word):
+        return word
+    rv, r2 = _regions(word)
+    prefix, part = word[:rv], word[rv:]
+    part = _inflection(part)
+    if part.endswith("и"):
+        part = part[:-1]
+    for ending in DERIVATIONAL:
+        if part.endswith(ending) and (
+            len(prefix) + len(part) - len(ending) >= r2
+        ):
+            part = part[: -len(ending)]
+            break
+    return prefix + _tidy_up(part)
+
+
+def words(text):
+    return re.findall(r"\w+", text.lower().replace("ё", "е"))
+
+
+def stems(text):
+    """Основы всех слов текста в исходном порядке."""
+    return [stem(word) for word in words(text)]
@@ -0,0 +1,74 @@
+"""Фоновые задачи постов (см. core.tasks).
+
+Задачи получают id и читают записи при выполнении: удалённый к тому
+времени пост пропускается, а изменённый индексируется в текущем виде.
+"""
+from collections import defaultdict
+
+from core.tasks import task
+from posts import caching, search, thumbnails, timeline
+from posts.models import Follow, Post
+
+
+@task("posts.fan_out", batch_size=100)
+def fan_out(payloads):
+    """Раскладывает новые посты по лентам подписчиков авторов."""
+    posts = Post.objects.filter(
+        pk__in=[payload["post"] for payload in payloads]
+    ).only("id", "author_id", "pub_date")
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    followers = set()
+    for author_id, author_posts in by_author.items():
+        followers.update(timeline.fan_out_many(author_id, author_posts))
+    # Ленты подписок, закэшированные до раскладки, устарели.
+    caching.bump(*(caching.follow_scope(user_id) for user_id in followers))
+
+
+@task("posts.backfill", batch_size=100)
+def backfill(payloads):
+    """Добавляет в ленты новых подписчиков последние посты авторов."""
+    users = set()
+    for payload in payloads:
+        user_id, author_id = payload["user"], payload["author"]
+        # Пока задача ждала, пользователь мог отписаться.
+        if Follow.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).exists():
+            timeline.backfill(user_id, author_id)
+            users.add(user_id)
+    caching.bump(*(caching.follow_scope(user_id) for user_id in users))
+
+
+@task("posts.follow_feeds", batch_size=100)
+def refresh_follow_feeds(payloads):
+    """Сбрасывает версии лент подписок подписчиков авторов. Версии
+    «знаменитостей» входят в ключ ленты подписок сами (см. follow_index)."""
+    authors = {payload["author"] for payload in payloads}
+    authors = [pk for pk in authors if not timeline.is_celebrity(pk)]
+    followers = (
+        Follow.objects.filter(author_id__in=authors)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+    caching.bump(*(caching.follow_scope(user_id) for user_id in followers))
+
+
+@task("posts.index", batch_size=500)
+def index(payloads):
+    search.index_posts(
+        Post.objects.filter(
+            pk__in=[payload["post"] for payload in payloads]
+        ).only("id", "text")
+    )
+
+
+@task("posts.thumbnails", batch_size=10)
+def make_thumbnails(payloads):
+    posts = Post.objects.filter(
+        pk__in=[payload["post"] for payload in payloads]
+    )
+    for post in posts:
+        if post.image:
+            thumbnails.generate(post)
@@ -0,0 +1,46 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, size="card"):
+    """Готовая миниатюра картинки поста или None.
+
+    Пока миниатюры нет, шаблон показывает заглушку. Тег ничего не
+    создаёт и не пишет в базу: подготовку ставит в очередь сохранение
+    поста (или команда generate_thumbnails).
+    """
+    if not post.image:
+        return None
+    return thumbnails.ready_thumbnail(post.image, size)
+
+
+@register.simple_tag
+def post_picture(post):
+    """srcset картинки поста по готовым вариантам или None.
+
+    Адреса строятся из сохранённых в посте имён файлов, без обращения
+    к хранилищу.
+    """
+    if not post.image:
+        return None
+    picture = thumbnails.ready_picture(post)
+    if picture is None:
+        return None
+    storage = post.image.storage
+    sources = {
+        extension: ", ".join(
+            f"{storage.url(name)} {width}w" for width, name in variants
+        )
+        for extension, variants in picture["variants"].items()
+    }
+    fallback_width, fallback = picture["variants"]["jpeg"][-1]
+    return {
+        "sources": sources,
+        "src": storage.url(fallback),
+        "width": fallback_width,
+        "height": round(picture["height"] * fallback_width / picture["width"]),
+    }
@@ -0,0 +1,284 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import (
+    Client,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import api_writes, batches, caching, idempotency, search
+from posts.models import (
+    AuthorStats,
+    Comment,
+    Follow,
+    Group,
+    IdempotencyKey,
+    Post,
+    TimelineEntry,
+)
+
+User = get_user_model()
+
+
+@override_settings(TASKS_EAGER=True)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="writer", first_name="Лев"
+        )
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="api-group", description="Описание"
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f"Пост {index}",
+                group=cls.group if index % 2 else None,
+            )
+            for index in range(15)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text="Комментарий"
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("api:posts"), {"fields": "id,text"})
+        self.assertEqual(response.status_code, 200)
+        for item in response.json()["results"]:
+            self.assertEqual(set(item), {"id", "text"})
+
+    def test_unknown_field_is_bad_request(self):
+        for params in ({"fields": "id,password"}, {"include": "post"}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse("api:posts"), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.json())
+
+    def test_include_costs_one_query_per_relation(self):
+        url = reverse("api:posts")
+        with self.assertNumQueries(1):
+            self.client.get(url, {"limit": 10})
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                url, {"limit": 10, "include": "author,group"}
+            )
+        items = response.json()["results"]
+        self.assertEqual(items[0]["author"]["username"], "writer")
+        grouped = [item for item in items if item["group"]]
+        self.assertTrue(grouped)
+        self.assertEqual(grouped[0]["group"]["slug"], "api-group")
+
+    def test_cursor_traversal_covers_all_posts(self):
+        seen, cursor = [], None
+        while True:
+            params = {"fields": "id", "limit": 4}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get(reverse("api:posts"), params).json()
+            seen.extend(item["id"] for item in data["results"])
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_detail_profile_and_comments(self):
+        post = self.posts[0]
+        data = self.client.get(
+            reverse("api:post", args=[post.id]), {"include": "author"}
+        ).json()
+        self.assertEqual(data["text"], post.text)
+        self.assertEqual(data["author"]["first_name"], "Лев")
+        self.assertEqual(data["comments_count"], 1)
+        comments = self.client.get(
+            reverse("api:comments", args=[post.id])
+        ).json()["results"]
+        self.assertEqual(comments[0]["text"], "Комментарий")
+        profile = self.client.get(
+            reverse("api:profile", args=["writer"])
+        ).json()
+        self.assertEqual(profile["posts"], 15)
+        self.assertEqual(profile["followers"], 1)
+        response = self.client.get(reverse("api:post", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_and_author_feeds(self):
+        group = self.client.get(
+            reverse("api:group_posts", args=["api-group"])
+        ).json()["results"]
+        self.assertTrue(all(item["group"] == self.group.id for item in group))
+        author = self.client.get(
+            reverse("api:author_posts", args=["reader"])
+        ).json()["results"]
+        self.assertEqual(author, [])
+
+    def test_follow_feed_requires_login(self):
+        url = reverse("api:follow")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        data = self.client.get(url, {"include": "author"}).json()
+        self.assertEqual(len(data["results"]), 10)
+        self.assertEqual(data["results"][0]["id"], self.posts[-1].id)
+        self.assertEqual(data["results"][0]["author"]["username"], "writer")
+
+
+@override_settings(TASKS_EAGER=True)
+class ApiWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="writer")
+        cls.follower = User.objects.create_user(username="follower")
+        cls.group = Group.objects.create(
+            title="Группа", slug="write-group", description="Описание"
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.token = api_writes.issue_token(self.author)
+
+    def post(self, url, payload, **headers):
+        return self.client.post(
+            url,
+            json.dumps(payload),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Token {self.token}",
+            **headers,
+        )
+
+    def test_token_required(self):
+        response = self.client.post(
+            reverse("api:posts"),
+            json.dumps({"posts": [{"text": "Текст"}]}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Token wrong",
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Post.objects.exists())
+
+    def test_batch_of_posts_has_single_post_side_effects(self):
+        response = self.post(
+            reverse("api:posts"),
+            {
+                "posts": [
+                    {"text": "Первый", "group": self.group.id},
+                    {"text": "Второй"},
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        results = response.json()["results"]
+        self.assertEqual(
+            [item["text"] for item in results], ["Первый", "Второй"]
+        )
+        ids = [item["id"] for item in results]
+        self.assertEqual(
+            list(Post.objects.order_by("id").values_list("id", flat=True)),
+            ids,
+        )
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts, 2)
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(user=self.follower).values_list(
+                    "post_id", flat=True
+                )
+            ),
+            set(ids),
+        )
+        found = Post.objects.filter(search.matching("Первый"))
+        self.assertEqual(list(found.values_list("id", flat=True)), ids[:1])
+
+    def test_invalid_item_rolls_back_batch(self):
+        response = self.post(
+            reverse("api:posts"),
+            {"posts": [{"text": "Хороший"}, {"text": " ", "group": 999}]},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["items"]["1"]), {"text", "group"})
+        self.assertFalse(Post.objects.exists())
+
+    def test_batch_of_comments_updates_counters(self):
+        first, second = (
+            Post.objects.create(author=self.follower, text=text)
+            for text in ("Один", "Два")
+        )
+        response = self.post(
+            reverse("api:create_comments"),
+            {
+                "comments": [
+                    {"post": first.id, "text": "А"},
+                    {"post": first.id, "text": "Б"},
+                    {"post": second.id, "text": "В"},
+                ]
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [item["post"] for item in response.json()["results"]],
+            [first.id, first.id, second.id],
+        )
+        first.refresh_from_db()
+        self.assertEqual(first.comments_count, 2)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).comments, 3)
+
+    def test_idempotency_key_replays_original_response(self):
+        payload = {"posts": [{"text": "Один раз"}]}
+        first = self.post(
+            reverse("api:posts"), payload, HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        retry = self.post(
+            reverse("api:posts"), payload, HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Post.objects.count(), 1)
+        other = self.post(
+            reverse("api:posts"),
+            {"posts": [{"text": "Другой"}]},
+            HTTP_IDEMPOTENCY_KEY="key-1",
+        )
+        self.assertEqual(other.status_code, 422)
+
+    def test_expired_key_is_reused_and_purged(self):
+        payload = {"posts": [{"text": "Снова"}]}
+        self.post(reverse("api:posts"), payload, HTTP_IDEMPOTENCY_KEY="old")
+        IdempotencyKey.objects.update(
+            expires=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(idempotency.purge(), 1)
+        self.post(reverse("api:posts"), payload, HTTP_IDEMPOTENCY_KEY="old")
+        self.assertEqual(Post.objects.count(), 2)
+
+
+@override_settings(TASKS_EAGER=True)
+class BatchCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="writer")
+
+    def test_feed_versions_move_after_commit(self):
+        """Версии лент сдвигаются только после фиксации транзакции"""
+        before = caching.versions(caching.GLOBAL)
+        with transaction.atomic():
+            posts = batches.create_posts(
+                self.author, [{"text": "Первый"}, {"text": "Второй"}]
+            )
+            self.assertEqual(caching.versions(caching.GLOBAL), before)
+        self.assertNotEqual(caching.versions(caching.GLOBAL), before)
+        self.assertEqual(
+            [post.pk for post in posts],
+            list(Post.objects.order_by("pk").values_list("pk", flat=True)),
+        )
@@ -0,0 +1,67 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from posts import benchmark
+from posts.models import Comment, Follow, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+VOLUMES = {
+    "users": 10,
+    "groups": 2,
+    "posts": 40,
+    "follows": 20,
+    "comments": 30,
+    "images": 2,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_and_run_all_scenarios(self):
+        """Заполнение базы и замер всех сценариев без ошибок"""
+        benchmark.seed(VOLUMES)
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertTrue(
+            Follow.objects.filter(user__username=benchmark.READER).exists()
+        )
+        self.assertEqual(Post.objects.exclude(image="").count(), 2)
+
+        report = benchmark.run(requests=5, concurrency=1, warmup=1)
+        self.assertEqual(
+            set(report),
+            {"index", "group_list", "profile", "follow_index", "post_detail"},
+        )
+        for name, result in report.items():
+            with self.subTest(name=name):
+                self.assertEqual(result["requests"], 5)
+                self.assertEqual(result["errors"], 0)
+                self.assertGreater(result["queries"], 0)
+                self.assertLessEqual(result["p50"], result["p99"])
+
+    def test_compare_reports_regressions(self):
+        baseline = {"index": {"p95": 10.0, "queries": 3.0}}
+        self.assertEqual(
+            benchmark.compare(
+                {"index": {"p95": 12.0, "queries": 3.0}}, baseline
+            ),
+            [],
+        )
+        regressions = benchmark.compare(
+            {"index": {"p95": 20.0, "queries": 5.0}}, baseline
+        )
+        self.assertEqual(len(regressions), 2)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
@@ -0,0 +1,96 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportContentTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+        group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=group, text="Пост"
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text="Комментарий"
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, *args):
+        path = os.path.join(self.directory.name, "export")
+        call_command(
+            "export_content", "--output", path, *args, stderr=StringIO()
+        )
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_ndjson_export(self):
+        """Выгрузка NDJSON содержит все виды записей"""
+        lines = self.export("--chunk-size", "1").decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [record["type"] for record in records],
+            ["post", "comment", "follow"],
+        )
+        self.assertEqual(records[0]["author"], "author")
+        self.assertEqual(records[0]["group"], "group")
+        self.assertEqual(records[1]["post"], self.post.pk)
+        self.assertEqual(
+            records[2],
+            {"type": "follow", "user": "reader", "author": "author"},
+        )
+
+    def test_gzipped_csv_export_can_be_imported_back(self):
+        """Сжатая выгрузка CSV загружается командой import_content"""
+        data = self.export("--format", "csv", "--gzip", "--type", "post")
+        rows = list(
+            csv.DictReader(io.StringIO(gzip.decompress(data).decode()))
+        )
+        self.assertEqual([row["text"] for row in rows], ["Пост"])
+        Post.objects.all().delete()
+        path = os.path.join(self.directory.name, "posts.csv.gz")
+        with open(path, "wb") as file:
+            file.write(data)
+        call_command("import_content", path, stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list("pk", "text")),
+            [(self.post.pk, "Пост")],
+        )
+
+    def test_endpoint_streams_for_staff_only(self):
+        """Выгрузка по HTTP доступна только сотрудникам и идёт потоком"""
+        url = reverse("posts:export_content")
+        client = Client()
+        client.force_login(self.reader)
+        self.assertEqual(client.get(url).status_code, 302)
+
+        staff = User.objects.create_user(username="staff", is_staff=True)
+        client.force_login(staff)
+        response = client.get(url, {"type": "follow", "gzip": "1"})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn(
+            "yatube-follow.ndjson.gz", response["Content-Disposition"]
+        )
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertEqual(
+            json.loads(content),
+            {"type": "follow", "user": "reader", "author": "author"},
+        )
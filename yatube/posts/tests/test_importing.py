@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import search, timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ImportContentTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+        self.group = Group.objects.create(
+            title="Архив", slug="archive", description="Старые посты"
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def import_content(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            "import_content", path, *args, stdout=stdout, stderr=stderr
+        )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_ndjson_import_with_derived_data(self):
+        """Загрузка NDJSON создаёт записи и пересчитывает производные
+        данные"""
+        records = [
+            {
+                "type": "post",
+                "id": 100,
+                "author": "author",
+                "group": "archive",
+                "text": "Прогулка по архиву",
+                "pub_date": "2015-05-01T10:00:00+00:00",
+            },
+            {
+                "type": "comment",
+                "post": 100,
+                "author": "reader",
+                "text": "!",
+                "created": "2015-05-02T10:00:00+00:00",
+            },
+            {"type": "follow", "user": "reader", "author": "author"},
+            {"type": "post", "author": "nobody", "text": "Чужой пост"},
+            {"type": "comment", "post": 999, "author": "reader", "text": "?"},
+        ]
+        path = self.write(
+            "archive.ndjson",
+            "\n".join(json.dumps(record) for record in records),
+        )
+        output, errors = self.import_content(
+            path, "--batch-size", "1", "--transaction-size", "2"
+        )
+        self.assertIn("пропущено 2", output)
+        self.assertIn("nobody", errors)
+
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().created.day, 2)
+        self.assertTrue(
+            Follow.objects.filter(user=self.reader, author=self.author)
+        )
+        self.assertEqual(AuthorStats.objects.get(user=self.author).posts, 1)
+        self.assertEqual(
+            [found.pk for found in search.search("прогулки")[0]], [100]
+        )
+        posts, _ = timeline.feed(self.reader)
+        self.assertEqual([entry.post_id for entry in posts], [100])
+        # Новые посты снова получают текущую дату.
+        self.assertEqual(
+            Post.objects.create(
+                author=self.author, text="Сейчас"
+            ).pub_date.year,
+            timezone.now().year,
+        )
+
+    def test_csv_import_creates_users(self):
+        """CSV с видом записей из --type и созданием пользователей"""
+        path = self.write(
+            "posts.csv",
+            "author,text,pub_date\n"
+            "author,Первый,2020-01-01T00:00:00\n"
+            "newcomer,Второй,\n",
+        )
+        self.import_content(path, "--type", "post", "--create-users")
+        self.assertEqual(
+            sorted(Post.objects.values_list("author__username", "text")),
+            [("author", "Первый"), ("newcomer", "Второй")],
+        )
+        self.assertFalse(
+            User.objects.get(username="newcomer").has_usable_password()
+        )
+
+    def test_repeated_import_skips_loaded_posts(self):
+        """Повторная загрузка не дублирует посты с явными id"""
+        path = self.write(
+            "posts.ndjson",
+            json.dumps(
+                {"type": "post", "id": 7, "author": "author", "text": "Раз"}
+            ),
+        )
+        self.import_content(path)
+        self.import_content(path, "--skip-rebuild")
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 0)
+
+    def test_existing_follows_are_not_counted(self):
+        """Уже существующие и повторные подписки не попадают в число
+        созданных"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        other = User.objects.create_user(username="other")
+        records = [
+            {"type": "follow", "user": "reader", "author": "author"},
+            {"type": "follow", "user": "other", "author": "author"},
+            {"type": "follow", "user": "other", "author": "author"},
+        ]
+        path = self.write(
+            "follows.ndjson",
+            "\n".join(json.dumps(record) for record in records),
+        )
+        output, _ = self.import_content(path, "--skip-rebuild")
+        self.assertIn("follow: 1", output)
+        self.assertTrue(Follow.objects.filter(user=other, author=self.author))
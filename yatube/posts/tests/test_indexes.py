@@ -0,0 +1,100 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN")
+class FeedIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="group", description="Описание"
+        )
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, table, index):
+        plan = self.plan(queryset)
+        steps = [step for step in plan if f" {table} " in f"{step} "]
+        self.assertTrue(steps, plan)
+        for step in steps:
+            self.assertIn(index, step, plan)
+        for step in plan:
+            self.assertNotIn("TEMP B-TREE", step, plan)
+
+    def feeds(self):
+        posts = Post.objects.select_related("author", "group")
+        return {
+            "index": (posts, "post_feed_idx"),
+            "group_list": (
+                self.group.group_list.select_related("author", "group"),
+                "post_group_feed_idx",
+            ),
+            "profile": (
+                self.author.posts.select_related("author", "group"),
+                "post_author_feed_idx",
+            ),
+        }
+
+    def test_page_queries_use_feed_indexes(self):
+        """Страницы лент читаются по индексу без отдельной сортировки"""
+        for name, (queryset, index) in self.feeds().items():
+            with self.subTest(feed=name):
+                self.assertUsesIndex(queryset[:10], "posts_post", index)
+
+    def test_cursor_queries_seek_in_feed_indexes(self):
+        """Запрос страницы по курсору начинает чтение индекса с курсора"""
+        for name, (queryset, index) in self.feeds().items():
+            with self.subTest(feed=name):
+                paginator = CursorPaginator(queryset, 10)
+                page = queryset.order_by(*paginator.ordering).filter(
+                    paginator._seek([timezone.now(), 1], forward=True)
+                )
+                self.assertUsesIndex(page[:11], "posts_post", index)
+                self.assertTrue(
+                    any("pub_date<?" in step for step in self.plan(page[:11]))
+                )
+
+    def test_follow_queries_use_indexes(self):
+        """Лента подписок и проверка подписки идут по индексам"""
+        entries, _ = timeline.feed(self.reader)
+        self.assertUsesIndex(
+            entries[:10], "posts_timelineentry", "USING COVERING INDEX"
+        )
+        self.assertUsesIndex(
+            Follow.objects.filter(user=self.reader, author=self.author),
+            "posts_follow",
+            "USING COVERING INDEX",
+        )
+
+    def test_comment_pages_use_index(self):
+        """Страница комментариев поста читается по индексу с курсора"""
+        comments = Comment.objects.filter(post_id=1).select_related("author")
+        paginator = CursorPaginator(comments, 20, ("created", "id"))
+        page = comments.order_by(*paginator.ordering).filter(
+            paginator._seek([timezone.now(), 1], forward=True)
+        )
+        self.assertUsesIndex(
+            page[:21], "posts_comment", "comment_post_created_idx"
+        )
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора отвергается базой"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
@@ -0,0 +1,143 @@
+import asyncio
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import events
+from core.asgi import ASGIHandler
+from posts import caching, live
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ChannelsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="live-author")
+        cls.reader = User.objects.create_user(username="live-reader")
+        cls.group = Group.objects.create(
+            title="Группа", slug="live-group", description="Описание"
+        )
+        cls.post = Post.objects.create(author=cls.author, text="Текст")
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_channels_for_each_feed(self):
+        cases = (
+            ({"feed": "index"}, [caching.GLOBAL]),
+            ({"group": "live-group"}, [caching.group_scope(self.group.id)]),
+            (
+                {"author": "live-author"},
+                [caching.author_scope(self.author.id)],
+            ),
+            ({"post": str(self.post.id)}, [live.post_channel(self.post.id)]),
+            ({"group": "missing"}, None),
+            ({"post": "abc"}, None),
+            ({"follow": "1"}, None),
+            ({}, None),
+        )
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(live.channels(query), expected)
+
+    def test_follow_feed_uses_session(self):
+        self.client.force_login(self.reader)
+        cookie = self.client.cookies.output(header="", sep=";").strip()
+        self.assertEqual(
+            live.channels({"follow": "1"}, cookie),
+            [caching.author_scope(self.author.id)],
+        )
+
+    def test_summary_counts_posts_and_comments(self):
+        received = [
+            ("index", {"post": 1}),
+            ("author:1", {"post": 1}),
+            ("index", {"post": 2}),
+            ("post:1", {"comment": 5, "post": 1}),
+        ]
+        self.assertEqual(
+            live.summary(received, lost=3),
+            b'event: posts\ndata: {"count":2}\n\n'
+            b'event: comments\ndata: {"count":1,"posts":[1]}\n\n'
+            b'event: stale\ndata: {"lost":3}\n\n',
+        )
+
+
+@override_settings(LIVE_EVENTS_DEBOUNCE=0.01)
+class StreamTests(TransactionTestCase):
+    """Запись идёт из потока пула, поэтому данные должны быть видны другим
+    соединениям с базой."""
+
+    def setUp(self):
+        events.get_broker.cache_clear()
+        self.handler = ASGIHandler(threads=2)
+        self.author = User.objects.create_user(username="stream-author")
+        self.post = Post.objects.create(author=self.author, text="Пост")
+
+    def tearDown(self):
+        self.handler.executor.shutdown(wait=True)
+        events.get_broker.cache_clear()
+
+    async def listen(self, query, write):
+        """Открывает поток, выполняет write и возвращает отправленное."""
+        sent, disconnect = [], asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/events/",
+            "query_string": query,
+            "headers": [],
+        }
+        task = asyncio.ensure_future(self.handler(scope, receive, send))
+        while not sent and not task.done():
+            await asyncio.sleep(0.01)
+        await self.handler.run(write)
+        for _ in range(100):
+            if len(sent) > 2:
+                break
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        await task
+        return sent
+
+    def test_new_posts_reach_index_stream(self):
+        def write():
+            for number in range(2):
+                Post.objects.create(author=self.author, text=f"Новый {number}")
+
+        sent = asyncio.run(self.listen(b"feed=index", write))
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertIn(
+            (b"Content-Type", b"text/event-stream; charset=utf-8"),
+            sent[0]["headers"],
+        )
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+        self.assertIn(b'event: posts\ndata: {"count":2}', body)
+        self.assertEqual(events.get_broker().subscribers, {})
+
+    def test_new_comment_reaches_post_stream(self):
+        def write():
+            Comment.objects.create(
+                post=self.post, author=self.author, text="Комментарий"
+            )
+
+        query = f"post={self.post.id}".encode()
+        sent = asyncio.run(self.listen(query, write))
+        body = b"".join(message.get("body", b"") for message in sent[1:])
+        self.assertIn(b"event: comments", body)
+
+    def test_unknown_feed_is_not_found(self):
+        sent = asyncio.run(self.listen(b"group=missing", lambda: None))
+        self.assertEqual(sent[0]["status"], 404)
+
+    def test_pages_include_stream_only_when_enabled(self):
+        url = reverse("posts:index")
+        self.assertNotContains(self.client.get(url), "EventSource")
+        with override_settings(LIVE_UPDATES=True):
+            self.assertContains(self.client.get(url), "/events/?feed=index")
@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.stemming import stem
+
+User = get_user_model()
+
+
+class StemmingTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Разные формы слова сводятся к одной основе"""
+        for forms in (
+            ("книга", "книги", "книгой"),
+            ("котами", "кот"),
+            ("красивая", "красивейшая"),
+            ("ёлка", "елки"),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+@override_settings(TASKS_EAGER=True)
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse("posts:post_search"), {"q": query, **params}
+        )
+        return response, [post.text for post in response.context["page_obj"]]
+
+    def test_finds_word_forms_ranked(self):
+        """Поиск находит другие формы слова, лучшие совпадения выше"""
+        Post.objects.create(author=self.author, text="Про собак и о кошках")
+        Post.objects.create(
+            author=self.author, text="Кошка, кошки, кошкой -- всё о кошках"
+        )
+        Post.objects.create(author=self.author, text="Про птиц")
+        _, texts = self.found("кошка")
+        self.assertEqual(
+            texts,
+            ["Кошка, кошки, кошкой -- всё о кошках", "Про собак и о кошках"],
+        )
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.create(author=self.author, text="Старый текст")
+        post.text = "Новый текст"
+        post.save()
+        self.assertEqual(self.found("старый")[1], [])
+        self.assertEqual(self.found("новый")[1], ["Новый текст"])
+        post.delete()
+        self.assertEqual(self.found("новый")[1], [])
+
+    @override_settings(POSTS_PER_PAGE=2)
+    def test_cursor_pagination_keeps_query(self):
+        """Результаты листаются курсором, запрос сохраняется в ссылках"""
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f"Заметка {number}")
+        response, first = self.found("заметки")
+        page_obj = response.context["page_obj"]
+        self.assertContains(response, f"cursor={page_obj.next_cursor}")
+        self.assertContains(response, "q=%D0%B7%D0%B0%D0%BC%D0%B5%D1%82")
+        _, second = self.found("заметки", cursor=page_obj.next_cursor)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(
+            sorted(first + second), [f"Заметка {n}" for n in range(3)]
+        )
+
+    def test_query_without_words_finds_nothing(self):
+        """Запрос из одних знаков препинания ничего не находит"""
+        Post.objects.create(author=self.author, text="Текст")
+        self.assertEqual(self.found('"*-')[1], [])
+
+    def test_rebuild_command_restores_index(self):
+        """Команда rebuild_search_index заново строит индекс"""
+        Post.objects.create(author=self.author, text="Проиндексированный")
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM posts_post_search")
+            self.assertEqual(self.found("проиндексированный")[1], [])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(
+            self.found("проиндексированный")[1], ["Проиндексированный"]
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит формы слова через индекс"""
+        admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="pass"
+        )
+        Post.objects.create(author=self.author, text="Весенние прогулки")
+        Post.objects.create(author=self.author, text="Зимний вечер")
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"), {"q": "прогулка"}
+        )
+        self.assertEqual(
+            [post.text for post in response.context["cl"].result_list],
+            ["Весенние прогулки"],
+        )
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import AuthorStats, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(user=user)
+        for name, value in expected.items():
+            self.assertEqual(getattr(stats, name), value, name)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении постов, комментариев
+        и подписок"""
+        post = Post.objects.create(author=self.author, text="Пост")
+        post.comments.create(author=self.reader, text="Комментарий")
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, posts=1, followers=1)
+        self.assertStats(self.reader, comments=1, following=1)
+        follow.delete()
+        post.delete()
+        self.assertStats(self.author, posts=0, followers=0)
+        self.assertStats(self.reader, comments=0, following=0)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Команда rebuild_author_stats пересчитывает счётчики с нуля"""
+        Post.objects.create(author=self.author, text="Пост")
+        AuthorStats.objects.filter(user=self.author).update(posts=42)
+        call_command(
+            "rebuild_author_stats", "--batch-size", "1", stdout=StringIO()
+        )
+        self.assertStats(self.author, posts=1)
+        self.assertStats(self.reader, posts=0)
@@ -0,0 +1,133 @@
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import tasks
+from core.models import Task
+from posts import thumbnails
+from posts.thumbnails import variant_name
+from posts.models import Post
+from PIL import Image
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b"\x47\x49\x46\x38\x39\x61\x02\x00"
+    b"\x01\x00\x80\x00\x00\x00\x00\x00"
+    b"\xFF\xFF\xFF\x21\xF9\x04\x00\x00"
+    b"\x00\x00\x00\x2C\x00\x00\x00\x00"
+    b"\x02\x00\x01\x00\x00\x02\x02\x0C"
+    b"\x0A\x00\x3B"
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.author,
+            text="Пост с картинкой",
+            image=SimpleUploadedFile("small.gif", SMALL_GIF, "image/gif"),
+        )
+
+    def test_thumbnails_are_ready_after_save(self):
+        """Миниатюры всех размеров готовы сразу после сохранения поста"""
+        post = self.create_post()
+        for size in settings.POST_THUMBNAILS:
+            with self.subTest(size=size):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(post.image, size)
+                )
+        response = self.client.get(
+            reverse("posts:post_detail", args=(post.pk,))
+        )
+        self.assertNotContains(response, "placeholder.svg")
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, страница показывает заглушку и не ждёт
+        её создания"""
+        with mock.patch.object(thumbnails, "enqueue") as enqueue:
+            post = self.create_post()
+            enqueue.assert_called_once_with(post)
+            response = self.client.get(
+                reverse("posts:post_detail", args=(post.pk,))
+            )
+        self.assertContains(response, "placeholder.svg")
+        # Отрисовка страницы ничего не ставит в очередь.
+        enqueue.assert_called_once_with(post)
+
+    def test_command_enqueues_missing_thumbnails(self):
+        """generate_thumbnails ставит в очередь посты без готовых вариантов"""
+        with mock.patch.object(thumbnails, "enqueue"):
+            post = self.create_post()
+        with mock.patch.object(thumbnails, "enqueue") as enqueue:
+            call_command("generate_thumbnails", stdout=io.StringIO())
+        enqueue.assert_called_once_with(post)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_failed_thumbnails_are_retried(self):
+        """Ошибка подготовки миниатюр доходит до исполнителя, и задача
+        остаётся в очереди для повтора"""
+        self.create_post()
+        failure = mock.patch.object(
+            thumbnails, "build_variants", side_effect=OSError("Битый файл")
+        )
+        with failure, self.assertLogs("yatube.tasks", "ERROR"):
+            while tasks.Worker(["posts.thumbnails"]).run_once():
+                pass
+        task = Task.objects.get(name="posts.thumbnails")
+        self.assertEqual(task.attempts, 1)
+        self.assertIn("Битый файл", task.last_error)
+
+    def test_width_variants_and_srcset(self):
+        """Для картинки создаются варианты по ширине в WebP и JPEG с
+        постоянными именами, а srcset строится без обращения к хранилищу"""
+        buffer = io.BytesIO()
+        Image.new("RGB", (700, 350), (255, 0, 0)).save(buffer, "JPEG")
+        post = Post.objects.create(
+            author=self.author,
+            text="Пост с большой картинкой",
+            image=SimpleUploadedFile("big.jpg", buffer.getvalue()),
+        )
+        post.refresh_from_db()
+        picture = thumbnails.ready_picture(post)
+        for extension in thumbnails.variant_formats():
+            with self.subTest(extension=extension):
+                self.assertEqual(
+                    picture["variants"][extension],
+                    [
+                        [size, variant_name(post.image.name, size, extension)]
+                        for size in (320, 640)
+                    ],
+                )
+        with mock.patch.object(
+            FileSystemStorage, "open", side_effect=AssertionError
+        ), mock.patch.object(
+            FileSystemStorage, "exists", side_effect=AssertionError
+        ):
+            response = self.client.get(
+                reverse("posts:post_detail", args=(post.pk,))
+            )
+        if "webp" in thumbnails.variant_formats():
+            self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, "/640.jpeg 640w")
+        self.assertContains(response, 'width="640" height="320"')
+        self.assertEqual(json.loads(post.image_variants)["width"], 700)
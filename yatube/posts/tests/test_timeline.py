@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@override_settings(TASKS_EAGER=True)
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username="author")
+        self.reader = User.objects.create_user(username="reader")
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.reader_client.get(reverse("posts:follow_index"))
+        return [post.text for post in response.context["page_obj"]]
+
+    def test_new_post_is_delivered_to_followers(self):
+        """Новый пост автора попадает в ленту каждого подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text="Новый пост")
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(self.feed_texts(), ["Новый пост"])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет в ленту старые посты автора, отписка убирает"""
+        Post.objects.create(author=self.author, text="Старый пост")
+        self.reader_client.get(
+            reverse("posts:profile_follow", args=(self.author.username,))
+        )
+        self.assertEqual(self.feed_texts(), ["Старый пост"])
+        self.reader_client.get(
+            reverse("posts:profile_unfollow", args=(self.author.username,))
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed_texts(), [])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты популярного автора не раскладываются по лентам, но видны
+        подписчикам при чтении ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text="Пост знаменитости")
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ["Пост знаменитости"])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_posts_stay_in_feed_when_author_is_no_longer_celebrity(self):
+        """Посты, опубликованные, пока автор был популярным, остаются в
+        ленте, когда подписчиков у него становится меньше порога"""
+        other = User.objects.create_user(username="other")
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        Post.objects.create(author=self.author, text="Пост знаменитости")
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(self.feed_texts(), ["Пост знаменитости"])
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader))
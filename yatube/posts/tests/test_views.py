@@ -1,12 +1,17 @@
+import re
 import shutil
 import tempfile
+import time
+from unittest import mock
 
 from django.db.models.fields.files import ImageFieldFile
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
@@ -16,7 +21,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=True)
 class PostTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -231,15 +236,71 @@ class PostTests(TestCase):
 
     def test_cache_index(self):
         """Тест кэширования главной страницы"""
-        post = Post.objects.get(pk=1)
         response_1 = self.authorized_client.get(reverse("posts:index"))
-        post.delete()
+        # Запись в обход сигналов не меняет версию ленты: страница из кэша.
+        Post.objects.filter(pk=1).update(text="Изменённый текст")
         response_2 = self.authorized_client.get(reverse("posts:index"))
         self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse("posts:index"))
         self.assertNotEqual(response_1.content, response_3.content)
 
+    def test_deleted_post_leaves_cached_feeds(self):
+        """Удалённый пост сразу пропадает из закэшированных лент"""
+        post = Post.objects.get(pk=1)
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": post.group.slug}),
+            reverse("posts:profile", kwargs={"username": post.author}),
+        ]
+        for url in urls:
+            self.assertContains(self.authorized_client.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotContains(response, post.text)
+
+    def test_cache_invalidated_by_writes(self):
+        """Новый пост и комментарий сразу видны на закэшированной главной"""
+        self.authorized_client.get(reverse("posts:index"))
+        self.authorized_client.post(
+            reverse("posts:post_create"), {"text": "Свежий пост"}
+        )
+        response = self.authorized_client.get(reverse("posts:index"))
+        self.assertContains(response, "Свежий пост")
+        self.authorized_client.post(
+            reverse("posts:add_comment", kwargs={"post_id": 1}),
+            {"text": "Комментарий"},
+        )
+        response = self.authorized_client.get(reverse("posts:index"))
+        self.assertContains(response, "Комментариев: 1")
+
+    def test_follow_feeds_do_not_share_cache(self):
+        """Закэшированная лента подписок одного пользователя не попадает
+        к другому"""
+        Follow.objects.create(user=self.user, author=self.userpost)
+        Follow.objects.create(user=self.user1, author=self.userpost1)
+        first = self.authorized_client.get(reverse("posts:follow_index"))
+        second = self.authorized_client1.get(reverse("posts:follow_index"))
+        self.assertContains(first, "Тестовый текст 1")
+        self.assertNotContains(first, "Тестовый текст 2")
+        self.assertContains(second, "Тестовый текст 2")
+        self.assertNotContains(second, "Тестовый текст 1")
+
+    def test_cached_follow_feed_shows_edits_and_comments(self):
+        """Правка поста и комментарий к нему сразу видны в закэшированной
+        ленте подписок"""
+        Follow.objects.create(user=self.user, author=self.userpost)
+        self.authorized_client.get(reverse("posts:follow_index"))
+        self.post1.text = "Исправленный текст"
+        self.post1.save()
+        response = self.authorized_client.get(reverse("posts:follow_index"))
+        self.assertContains(response, "Исправленный текст")
+        self.post1.comments.create(author=self.user1, text="Комментарий")
+        response = self.authorized_client.get(reverse("posts:follow_index"))
+        self.assertContains(response, "Комментариев: 1")
+
     def test_add_and_existence_comment(self):
         """Комментировать посты может только авторизованный пользователь.
         Комментарий появляется на странице поста."""
@@ -311,6 +372,9 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(cls.posts)
 
     def setUp(self):
+        # bulk_create не сдвигает версии лент, поэтому фрагменты, которые
+        # закэшировали другие тесты, остались бы действительными.
+        cache.clear()
         self.guest_client = Client()
 
         self.user = User.objects.create_user(username="lordkisik")
@@ -346,3 +410,255 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(
                 len(response.context.get("page_obj").object_list), 3
             )
+
+    def test_cursor_pages_cover_all_posts(self):
+        """По ссылкам ?cursor= ленты index, group_list и profile проходятся
+        целиком, без повторов, а курсор «назад» возвращает первую страницу"""
+        list_urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "admin111"}),
+        ]
+        for tested_url in list_urls:
+            with self.subTest(tested_url=tested_url):
+                first = self.client.get(tested_url + "?cursor=")
+                first_page = first.context["page_obj"]
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second = self.client.get(
+                    tested_url + "?cursor=" + first_page.next_cursor
+                )
+                second_page = second.context["page_obj"]
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                ids = [post.id for post in first_page] + [
+                    post.id for post in second_page
+                ]
+                self.assertEqual(ids, list(range(13, 0, -1)))
+                back = self.client.get(
+                    tested_url + "?cursor=" + second_page.previous_cursor
+                )
+                self.assertEqual(
+                    [post.id for post in back.context["page_obj"]],
+                    ids[:10],
+                )
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_paginator_links_only_nearby_pages(self):
+        """Паджинатор ссылается только на соседние страницы"""
+        response = self.client.get(reverse("posts:index") + "?page=7")
+        pages = re.findall(r'href="\?page=(\d+)"', response.content.decode())
+        self.assertEqual(
+            sorted(set(map(int, pages))), [1, 4, 5, 6, 8, 9, 10, 13]
+        )
+
+    def test_cards_hide_redundant_links(self):
+        """В ленте группы нет кнопки группы, в профиле -- ссылки на автора"""
+        group_url = reverse("posts:group_list", kwargs={"slug": "test-slug"})
+        profile_url = reverse("posts:profile", kwargs={"username": "admin111"})
+        self.assertNotContains(self.client.get(group_url), "Все записи группы")
+        self.assertContains(
+            self.client.get(reverse("posts:index")), f'href="{group_url}"'
+        )
+        self.assertNotContains(
+            self.client.get(profile_url), f'href="{profile_url}"'
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор не ломает страницу, а отдаёт начало ленты"""
+        response = self.client.get(reverse("posts:index") + "?cursor=abc")
+        self.assertEqual(len(response.context["page_obj"]), 10)
+
+
+@override_settings(TASKS_EAGER=True)
+class FeedQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовый тайтл",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number_post in range(12):
+            post = Post.objects.create(
+                author=cls.author,
+                text=f"Тестовый текст поста номер {number_post}",
+                group=cls.group,
+            )
+            post.comments.create(author=cls.reader, text="Комментарий")
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        return response, len(queries)
+
+    def test_comments_count_is_denormalized(self):
+        """Счётчик комментариев поста хранится в самом посте"""
+        post = Post.objects.first()
+        self.assertEqual(post.comments_count, 1)
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов страницы ленты не зависит от числа постов на ней"""
+        urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+            reverse("posts:follow_index"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with self.settings(POSTS_PER_PAGE=2):
+                    _, small_page = self.count_queries(url)
+                with self.settings(POSTS_PER_PAGE=10):
+                    response, large_page = self.count_queries(url)
+                self.assertEqual(len(response.context["page_obj"]), 10)
+                self.assertContains(response, "Комментариев: 1")
+                self.assertEqual(small_page, large_page)
+                self.assertLessEqual(large_page, 8)
+
+    def test_post_detail_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        few = Post.objects.first()
+        many = Post.objects.last()
+        for number in range(30):
+            many.comments.create(author=self.author, text=f"Ответ {number}")
+        _, few_queries = self.count_queries(
+            reverse("posts:post_detail", kwargs={"post_id": few.id})
+        )
+        response, many_queries = self.count_queries(
+            reverse("posts:post_detail", kwargs={"post_id": many.id})
+        )
+        self.assertEqual(
+            len(response.context["comments"]), settings.COMMENTS_PER_PAGE
+        )
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(many_queries, 5)
+
+
+@override_settings(COMMENTS_PER_PAGE=10)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username="author")
+        cls.post = Post.objects.create(author=cls.author, text="Пост")
+        for number in range(25):
+            cls.post.comments.create(
+                author=cls.author, text=f"Комментарий №{number}"
+            )
+
+    def test_post_page_shows_oldest_comments_first(self):
+        """На странице поста -- первая страница комментариев"""
+        response = self.client.get(
+            reverse("posts:post_detail", kwargs={"post_id": self.post.id})
+        )
+        comments = response.context["comments"]
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f"Комментарий №{number}" for number in range(10)],
+        )
+        self.assertContains(response, f"?comments={comments.next_cursor}")
+
+    def test_load_more_returns_next_pages(self):
+        """Кнопка «Показать ещё» получает следующие страницы в JSON"""
+        url = reverse("posts:post_comments", kwargs={"post_id": self.post.id})
+        cursor, numbers = "", []
+        for _ in range(3):
+            data = self.client.get(url, {"cursor": cursor}).json()
+            numbers += re.findall(r"Комментарий №(\d+)", data["html"])
+            cursor = data["next_cursor"]
+        self.assertEqual(numbers, [str(number) for number in range(25)])
+        self.assertEqual(cursor, "")
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username="author")
+        cls.reader = User.objects.create_user(username="reader")
+        cls.group = Group.objects.create(
+            title="Тестовый тайтл",
+            slug="test-slug",
+            description="Тестовое описание",
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text="Тестовый текст"
+        )
+        cls.urls = [
+            reverse("posts:index"),
+            reverse("posts:group_list", kwargs={"slug": "test-slug"}),
+            reverse("posts:profile", kwargs={"username": "author"}),
+            reverse("posts:post_detail", kwargs={"post_id": cls.post.id}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_pages_are_not_rendered(self):
+        """Повторный запрос с тем же ETag получает 304 без отрисовки"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertIn("Last-Modified", first)
+                with self.assertTemplateNotUsed("base.html"):
+                    second = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=first["ETag"]
+                    )
+                self.assertEqual(second.status_code, 304)
+
+    def test_changes_and_other_user_get_full_page(self):
+        """После нового комментария и для другого пользователя ETag другой"""
+        etags = {url: self.client.get(url)["ETag"] for url in self.urls}
+        self.post.comments.create(author=self.reader, text="Комментарий")
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+        url = self.urls[0]
+        etag = self.client.get(url)["ETag"]
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_deleted_post_changes_validators(self):
+        """После удаления поста ленты отдаются заново и по ETag, и по
+        If-Modified-Since"""
+        removed = Post.objects.create(
+            author=self.author, group=self.group, text="Удаляемый пост"
+        )
+        urls = self.urls[:3]
+        first = {url: self.client.get(url) for url in urls}
+        # Last-Modified передаётся с точностью до секунды.
+        later = time.time_ns() + 2 * 10**9
+        with mock.patch("time.time_ns", return_value=later):
+            removed.delete()
+        for url, response in first.items():
+            for header, value in (
+                ("HTTP_IF_NONE_MATCH", response["ETag"]),
+                ("HTTP_IF_MODIFIED_SINCE", response["Last-Modified"]),
+            ):
+                with self.subTest(url=url, header=header):
+                    self.assertEqual(
+                        self.client.get(url, **{header: value}).status_code,
+                        200,
+                    )
+
+    def test_missing_pages_still_return_404(self):
+        response = self.client.get(
+            reverse("posts:group_list", kwargs={"slug": "missing"})
+        )
+        self.assertEqual(response.status_code, 404)
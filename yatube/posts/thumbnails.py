@@ -0,0 +1,146 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры всех размеров из POST_THUMBNAILS и варианты картинки по ширине
+из POST_IMAGE_WIDTHS (WebP и JPEG) создаются фоновой задачей
+(posts.tasks) сразу после сохранения поста, а не при первой отрисовке
+ленты. Пока они не готовы, шаблоны показывают заглушку (теги post_picture
+и post_thumbnail).
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import tasks
+from posts import caching, timeline
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+
+def _thumbnail_name(source, geometry, options):
+    """Имя файла миниатюры с теми же умолчаниями, что у get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def ready_picture(post):
+    """Описание готовых вариантов картинки поста или None.
+
+    Описание устарело, если картинку поста заменили после его создания.
+    """
+    if not post.image_variants:
+        return None
+    picture = json.loads(post.image_variants)
+    if picture["source"] != post.image.name:
+        return None
+    return picture
+
+
+def ready_thumbnail(image, size):
+    """Готовая миниатюра размера size или None, если её ещё нет.
+
+    В отличие от тега thumbnail ничего не создаёт: проверяется только
+    хранилище ключей sorl-thumbnail.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    source = ImageFile(image)
+    name = _thumbnail_name(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def variant_formats():
+    """Форматы вариантов: WebP -- если Pillow собран с его поддержкой."""
+    formats = {"jpeg": "JPEG"}
+    if features.check("webp"):
+        formats = {"webp": "WEBP", **formats}
+    return formats
+
+
+def variant_name(source_name, width, extension):
+    """Имя файла варианта зависит только от исходной картинки и ширины."""
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha1(source_name.encode()).hexdigest()[:12]
+    return f"posts/variants/{stem}-{digest}/{width}.{extension}"
+
+
+def build_variants(post):
+    """Создаёт варианты картинки по ширине и сохраняет их описание в пост.
+
+    Описание (имена файлов и размеры) лежит в Post.image_variants, чтобы
+    шаблон строил srcset без обращения к хранилищу.
+    """
+    storage = post.image.storage
+    with storage.open(post.image.name, "rb") as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    width, height = image.size
+    widths = [size for size in settings.POST_IMAGE_WIDTHS if size <= width]
+    variants = {}
+    for extension, image_format in variant_formats().items():
+        variants[extension] = []
+        for size in widths or [width]:
+            name = variant_name(post.image.name, size, extension)
+            if not storage.exists(name):
+                resized = image.resize(
+                    (size, max(1, round(height * size / width))),
+                    Image.LANCZOS,
+                )
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, quality=82)
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            variants[extension].append([size, name])
+    post.image_variants = json.dumps(
+        {
+            "source": post.image.name,
+            "width": width,
+            "height": height,
+            "variants": variants,
+        }
+    )
+    Post.objects.filter(pk=post.pk).update(
+        image_variants=post.image_variants, updated=timezone.now()
+    )
+
+
+def generate(post):
+    """Создаёт все миниатюры поста и сбрасывает кэш лент с ним. Ошибка
+    передаётся дальше, чтобы исполнитель задач повторил попытку."""
+    try:
+        build_variants(post)
+        for geometry, options in settings.POST_THUMBNAILS.values():
+            get_thumbnail(post.image.name, geometry, **options)
+        caching.bump(*caching.post_scopes(post))
+        timeline.changed(post.author_id)
+    except Exception:
+        logger.exception("Не удалось подготовить миниатюры поста %s", post.pk)
+        raise
+
+
+def enqueue(post):
+    """Ставит подготовку миниатюр поста в очередь фоновых задач.
+
+    Повторная постановка той же картинки, пока задача ждёт, игнорируется.
+    """
+    if not post.image:
+        return
+    tasks.enqueue("posts.thumbnails", key=post.image.name, post=post.pk)
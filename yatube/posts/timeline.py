@@ -0,0 +1,143 @@
+"""Лента подписок с доставкой при записи (fan-out-on-write).
+
+Новый пост раскладывается по лентам подписчиков автора фоновой задачей
+(posts.tasks), поэтому follow_index читает готовый отсортированный список
+id из TimelineEntry.
+Посты авторов с числом подписчиков больше TIMELINE_FANOUT_MAX_FOLLOWERS
+не раскладываются, а подмешиваются в ленту при чтении (fan-out-on-read).
+Когда такой автор опускается до порога, его посты перестают подмешиваться,
+поэтому ленты всех его подписчиков дополняются так же, как при подписке.
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from core import tasks
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+
+ENTRY_ORDERING = ("-pub_date", "-post_id")
+POST_ORDERING = ("-pub_date", "-id")
+
+
+def is_celebrity(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def just_demoted(author_id):
+    """Автор только что перестал быть «знаменитостью»: после отписки у него
+    ровно TIMELINE_FANOUT_MAX_FOLLOWERS подписчиков."""
+    return AuthorStats.objects.filter(
+        user_id=author_id, followers=settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def fan_out(post):
+    """Доставляет новый пост в ленты всех подписчиков автора."""
+    fan_out_many(post.author_id, [post])
+
+
+def fan_out_many(author_id, posts):
+    """Доставляет пачку новых постов одного автора: подписчики читаются
+    один раз на всю пачку. Возвращает id подписчиков."""
+    if not posts or is_celebrity(author_id):
+        return []
+    followers = list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            "user_id", flat=True
+        )
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for post in posts
+            for user_id in followers
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    return followers
+
+
+def changed(*author_ids):
+    """Посты авторов изменились (правка, удаление, комментарии): версии
+    лент подписок их подписчиков сбрасывает фоновая задача."""
+    for author_id in set(author_ids):
+        tasks.enqueue(
+            "posts.follow_feeds", key=str(author_id), author=author_id
+        )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние посты нового автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        "id", "pub_date"
+    )[: settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора, от которого пользователь отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild():
+    """Заново раскладывает посты по лентам всех подписчиков.
+
+    Нужна после массовой загрузки: bulk_create не вызывает сигналы, и
+    новые посты и подписки в ленты не попадают.
+    """
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.order_by("pk").values_list("user_id", "author_id")
+    for user_id, author_id in follows.iterator():
+        backfill(user_id, author_id)
+
+
+def celebrities_followed_by(user):
+    followed = Follow.objects.filter(user=user).values("author_id")
+    return AuthorStats.objects.filter(
+        user_id__in=followed,
+        followers__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).values_list("user_id", flat=True)
+
+
+def feed(user, celebrities=None):
+    """Возвращает выборку для постраничного вывода и порядок сортировки.
+
+    Обычно это записи TimelineEntry, которые после выбора страницы нужно
+    превратить в посты функцией hydrate. Если пользователь подписан на
+    авторов, чьи посты не раскладываются по лентам (celebrities, если
+    они уже известны), выборка строится сразу по постам:
+    материализованная лента плюс посты таких авторов.
+    """
+    if celebrities is None:
+        celebrities = list(celebrities_followed_by(user))
+    entries = TimelineEntry.objects.filter(user=user)
+    if not celebrities:
+        return entries, ENTRY_ORDERING
+    posts = Post.objects.filter(
+        Q(pk__in=entries.values("post_id")) | Q(author_id__in=celebrities)
+    ).select_related("author", "group")
+    return posts, POST_ORDERING
+
+
+def hydrate(items):
+    """Загружает посты страницы ленты одним запросом IN, сохраняя порядок."""
+    items = list(items)
+    if not items or isinstance(items[0], Post):
+        return items
+    ids = [entry.post_id for entry in items]
+    posts = Post.objects.select_related("author", "group").in_bulk(ids)
+    return [posts[post_id] for post_id in ids if post_id in posts]
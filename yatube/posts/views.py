@@ -1,41 +1,96 @@
 from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
+from django.template.loader import render_to_string
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
+from django.db import transaction
 
+from core import db_routers
+from posts import caching, conditional, exporting, search, stats, timeline
+from posts.importing import KINDS
 from posts.forms import PostForm, CommentForm
 from posts.models import Group, Post, User, Comment, Follow
+from posts.paginators import CursorPaginator
 
 
-def paginator(request, object):
+def paginator(request, object, ordering=timeline.POST_ORDERING):
+    """Страница ленты: по курсору (?cursor=) или по номеру (?page=).
+
+    Ссылки с номером страницы продолжают работать; без параметров режим
+    выбирается настройкой POSTS_CURSOR_PAGINATION.
+    """
+    cursor = request.GET.get("cursor")
+    if cursor is not None or (
+        settings.POSTS_CURSOR_PAGINATION and "page" not in request.GET
+    ):
+        return CursorPaginator(object, settings.POSTS_PER_PAGE, ordering).page(
+            cursor
+        )
     paginator = Paginator(object, settings.POSTS_PER_PAGE)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
+def comments_page(post_id, cursor):
+    """Страница комментариев поста, от старых к новым, по курсору."""
+    comments = Comment.objects.filter(post_id=post_id).select_related("author")
+    return CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ("created", "id")
+    ).page(cursor)
+
+
+def index_posts():
+    return Post.objects.select_related("author", "group")
+
+
+def group_posts(group):
+    return group.group_list.select_related("author", "group")
+
+
+def author_posts(author):
+    return author.posts.select_related("author", "group")
+
+
+def feed_cache(page_obj, *scopes):
+    """Ключ и время жизни фрагментного кэша страницы ленты."""
+    timeout = settings.FEED_CACHE_TIMEOUT
+    if db_routers.reading_from_replica():
+        timeout = min(timeout, settings.REPLICA_CACHE_TIMEOUT)
+    return {
+        "feed_cache_key": caching.feed_key(page_obj, *scopes),
+        "feed_cache_timeout": timeout,
+    }
+
+
+@conditional.validated(conditional.index)
 def index(request):
-    post_list = Post.objects.all().select_related("author")
-    page_obj = paginator(request, post_list)
+    page_obj = paginator(request, index_posts())
     template = "posts/index.html"
-    context = {"page_obj": page_obj}
+    context = {"page_obj": page_obj, **feed_cache(page_obj, caching.GLOBAL)}
     return render(request, template, context)
 
 
+@conditional.validated(conditional.group_list)
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    group_list = group.group_list.all()
-    page_obj = paginator(request, group_list)
+    page_obj = paginator(request, group_posts(group))
     template = "posts/group_list.html"
-    context = {"group": group, "page_obj": page_obj}
+    context = {
+        "group": group,
+        "page_obj": page_obj,
+        **feed_cache(page_obj, caching.group_scope(group.id)),
+    }
     return render(request, template, context)
 
 
+@conditional.validated(conditional.profile)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    post_counter = author.posts.count()
-    page_obj = paginator(request, post_list)
+    post_counter = stats.for_user(author).posts
+    page_obj = paginator(request, author_posts(author))
     template = "posts/profile.html"
     if request.user.is_authenticated:
         following = Follow.objects.filter(
@@ -48,16 +103,20 @@ def profile(request, username):
         "post_counter": post_counter,
         "page_obj": page_obj,
         "following": following,
+        **feed_cache(page_obj, caching.author_scope(author.id)),
     }
     return render(request, template, context)
 
 
+@conditional.validated(conditional.post_detail)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related("author__stats", "group"), id=post_id
+    )
     title = post.text[:30]
-    post_counter = post.author.posts.count()
+    post_counter = stats.for_user(post.author).posts
     form = CommentForm()
-    comments = Comment.objects.filter(post_id=post_id)
+    comments = comments_page(post_id, request.GET.get("comments"))
     template = "posts/post_detail.html"
     context = {
         "post": post,
@@ -69,7 +128,31 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_search(request):
+    query = request.GET.get("q", "").strip()
+    page_obj = None
+    if query:
+        post_list, ordering = search.search(query)
+        page_obj = CursorPaginator(
+            post_list, settings.POSTS_PER_PAGE, ordering
+        ).page(request.GET.get("cursor"))
+    template = "posts/search.html"
+    context = {"query": query, "page_obj": page_obj}
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    comments = comments_page(post_id, request.GET.get("cursor"))
+    html = render_to_string(
+        "includes/comments.html", {"comments": comments}, request
+    )
+    return JsonResponse({"html": html, "next_cursor": comments.next_cursor})
+
+
+@db_routers.primary_only
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     template = "posts/create_post.html"
@@ -81,7 +164,9 @@ def post_create(request):
     return redirect("posts:profile", request.user.username)
 
 
+@db_routers.primary_only
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.user != post.author:
@@ -101,7 +186,9 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@db_routers.primary_only
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = Post.objects.get(pk=post_id)
     form = CommentForm(request.POST or None)
@@ -115,16 +202,23 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    celebrities = sorted(timeline.celebrities_followed_by(request.user))
+    post_list, ordering = timeline.feed(request.user, celebrities)
+    page_obj = paginator(request, post_list, ordering)
+    page_obj.object_list = timeline.hydrate(page_obj.object_list)
+    # Версию ленты подписок сбрасывают раскладка и изменения постов
+    # авторов; посты «знаменитостей» не раскладываются, поэтому их версии
+    # входят в ключ отдельно.
+    scopes = [caching.follow_scope(request.user.id)]
+    scopes += [caching.author_scope(author_id) for author_id in celebrities]
     template = "posts/follow.html"
-    context = {"page_obj": page_obj}
+    context = {"page_obj": page_obj, **feed_cache(page_obj, *scopes)}
     return render(request, template, context)
 
 
+@db_routers.primary_only
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = User.objects.get(username=username)
@@ -133,7 +227,9 @@ def profile_follow(request, username):
     return redirect("posts:profile", username=username)
 
 
+@db_routers.primary_only
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     user = request.user
     author = User.objects.get(username=username)
@@ -141,3 +237,23 @@ def profile_unfollow(request, username):
     if follow.exists():
         follow.delete()
     return redirect("posts:profile", username=username)
+
+
+@staff_member_required
+def export_content(request):
+    """Выгрузка записей в NDJSON или CSV потоком, без загрузки в память."""
+    kinds = [kind for kind in request.GET.getlist("type") if kind in KINDS]
+    kinds = kinds or list(KINDS)
+    file_format = request.GET.get("format")
+    if file_format not in exporting.FORMATS:
+        file_format = "ndjson"
+    compress = request.GET.get("gzip") == "1"
+    response = StreamingHttpResponse(
+        exporting.stream(kinds, file_format, compress),
+        content_type=(
+            "application/gzip" if compress else exporting.FORMATS[file_format]
+        ),
+    )
+    name = exporting.filename(kinds, file_format, compress)
+    response["Content-Disposition"] = f'attachment; filename="{name}"'
+    return response
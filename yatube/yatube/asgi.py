@@ -0,0 +1,20 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no ASGI support of its own, see core.asgi.
+"""
+
+import os
+
+from django.conf import settings
+
+from core import warmup
+from core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = get_asgi_application()
+
+if settings.TEMPLATE_WARMUP:
+    warmup.warm_up()
@@ -9,7 +9,9 @@ https://docs.djangoproject.com/en/2.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
+import importlib.util
 import os
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,20 +26,87 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
 
+# Профиль настроек: development (по умолчанию) или production. В
+# production выключены DEBUG и debug_toolbar, шаблоны кэшируются,
+# статика раздаётся с хэшами в именах, ответы сжимаются, а соединения с
+# базой живут CONN_MAX_AGE секунд. Проверка core.checks не даст запустить
+# production с отладочными инструментами
+PROFILE = os.getenv("DJANGO_PROFILE", "development")
+PRODUCTION = PROFILE == "production"
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+# Постраничный вывод лент по курсору вместо номера страницы
+POSTS_CURSOR_PAGINATION = os.getenv("POSTS_CURSOR_PAGINATION") == "1"
+
+# Лента подписок: авторы с большим числом подписчиков не раскладывают посты
+# по лентам при публикации, их посты подмешиваются при чтении
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv("TIMELINE_FANOUT_MAX_FOLLOWERS", 10000)
+)
+TIMELINE_BACKFILL_SIZE = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Страницы лент кэшируются надолго: ключ фрагмента содержит версию ленты,
+# которая меняется при каждой записи
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Миниатюры картинок постов (геометрия и параметры sorl-thumbnail) готовятся
+# фоновой задачей сразу после сохранения поста
+POST_THUMBNAILS = {
+    "card": ("960x960", {"crop": "center", "upscale": True}),
+}
+# Ширины вариантов картинки поста для srcset (WebP и JPEG)
+POST_IMAGE_WIDTHS = (320, 640, 960, 1920)
+
+# Запись через API: предельный размер пачки и срок хранения ответов на
+# запросы с Idempotency-Key (просроченные удаляет purge_idempotency_keys)
+API_BATCH_MAX = 100
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Метрики запросов (core.metrics): заголовок Server-Timing, гистограммы
+# в формате Prometheus на /metrics/ (сотрудникам и по METRICS_TOKEN) и
+# журнал yatube.slow_requests: доля SLOW_REQUEST_SAMPLE_RATE запросов
+# запоминает свой SQL и попадает в журнал, если ответ занял больше
+# SLOW_REQUEST_SECONDS (в файл SLOW_REQUEST_LOG, если он задан)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", 0.01))
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 0.5))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "slow_requests": (
+            {"class": "logging.FileHandler", "filename": SLOW_REQUEST_LOG}
+            if SLOW_REQUEST_LOG
+            else {"class": "logging.StreamHandler"}
+        ),
+    },
+    "loggers": {
+        "yatube.slow_requests": {
+            "handlers": ["slow_requests"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
 
 CSRF_FAILURE_VIEW = "core.views.csrf_failure"
 
 ALLOWED_HOSTS = [".localhost", "127.0.0.1", "[::1]"]
+if os.getenv("ALLOWED_HOSTS"):
+    ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS").split(",")
 
 
 # Application definition
 
 INSTALLED_APPS = [
-    "debug_toolbar",
     "posts.apps.PostsConfig",
     "django.contrib.admin",
     "django.contrib.auth",
@@ -52,22 +121,36 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
+if DEBUG:
+    INSTALLED_APPS.insert(0, "debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+if PRODUCTION:
+    # Сжатие ответов и 304 Not Modified по ETag готовой страницы
+    position = (
+        MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1
+    )
+    MIDDLEWARE[position:position] = [
+        "django.middleware.gzip.GZipMiddleware",
+        "django.middleware.http.ConditionalGetMiddleware",
+    ]
 
 ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "core.template_backends.DjangoTemplates",
+        "NAME": "django",
         "DIRS": [TEMPLATES_DIR],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -77,12 +160,55 @@ TEMPLATES = [
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
                 "core.context_processors.year.year",
+                "core.context_processors.live.live_updates",
             ],
         },
     },
 ]
 
+# Загружать все шаблоны при запуске WSGI- или ASGI-процесса (см. core.warmup)
+TEMPLATE_WARMUP = PRODUCTION
+if PRODUCTION:
+    # Шаблоны разбираются один раз на процесс
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        (
+            "django.template.loaders.cached.Loader",
+            [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
+        ),
+    ]
+
 WSGI_APPLICATION = "yatube.wsgi.application"
+# Потоки, в которых yatube.asgi обрабатывает запросы (см. core.asgi), и
+# адреса, которые ASGI-приложение обслуживает само, без Django
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 8))
+ASGI_ROUTES = {"/events/": "posts.live.stream"}
+
+# Живые обновления лент и постов (server-sent events, только под ASGI):
+# брокер событий (core.events), размер очереди подписчика, сколько секунд
+# копить события перед отправкой и как часто слать пустой пинг
+LIVE_UPDATES = os.getenv("LIVE_UPDATES") == "1"
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "core.events.LocalBroker")
+EVENTS_QUEUE_SIZE = 100
+LIVE_EVENTS_DEBOUNCE = 1.0
+LIVE_EVENTS_HEARTBEAT = 15
+
+# Фоновые задачи (core.tasks) выполняет manage.py run_worker. Вне production
+# задачи выполняются сразу при постановке: так не нужен отдельный процесс,
+# а тесты видят результат сразу. Тесты очереди включают её сами через
+# override_settings(TASKS_EAGER=False)
+TASKS_EAGER = os.getenv("TASKS_EAGER", "0" if PRODUCTION else "1") == "1"
+TASKS_MAX_ATTEMPTS = 5
+# Сколько секунд забранная задача скрыта от других исполнителей
+TASKS_VISIBILITY_TIMEOUT = 300
+# Задержка повтора: TASKS_RETRY_DELAY * 2 ** (попытка - 1), не больше
+# TASKS_RETRY_MAX_DELAY секунд
+TASKS_RETRY_DELAY = 10
+TASKS_RETRY_MAX_DELAY = 60 * 60
+TASKS_POLL_INTERVAL = 1.0
 
 
 # Database
@@ -95,6 +221,46 @@ DATABASES = {
     }
 }
 
+# Профиль SQLite для нагрузки (SQLITE_TUNING=1): PRAGMA из SQLITE_PRAGMAS
+# выполняются при открытии каждого соединения (см. core.sqlite), а
+# соединения не закрываются после запроса, а живут CONN_MAX_AGE секунд.
+# Сравнить с настройками по умолчанию: manage.py sqlite_benchmark
+SQLITE_TUNING = os.getenv("SQLITE_TUNING") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # Отрицательное значение -- размер в КиБ, т. е. 64 МБ
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+if SQLITE_TUNING or PRODUCTION:
+    DATABASES["default"]["CONN_MAX_AGE"] = int(
+        os.getenv("CONN_MAX_AGE", 600)
+    )
+
+# Реплики только для чтения: пути к файлам SQLite через запятую (локально
+# это копии db.sqlite3). С реплик читают представления из
+# REPLICA_VIEW_MODULES; после записи пользователь ещё
+# REPLICA_STICKY_SECONDS секунд читает из основной базы
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICAS", "").split(",")), start=1
+):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "NAME": path,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+DATABASE_ROUTERS = ["core.db_routers.ReplicaRouter"]
+REPLICA_VIEW_MODULES = ("posts.views",)
+REPLICA_STICKY_SECONDS = 10
+# Страница, прочитанная с реплики, кэшируется ненадолго, чтобы отставание
+# реплики не закрепилось во фрагментном кэше на FEED_CACHE_TIMEOUT
+REPLICA_CACHE_TIMEOUT = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -133,6 +299,13 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = "/static/"
+STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
+if PRODUCTION:
+    # Имена файлов с хэшем содержимого: браузер кэширует статику навсегда.
+    # Нужен manage.py collectstatic при каждом выпуске
+    STATICFILES_STORAGE = (
+        "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"
+    )
 
 LOGIN_URL = "users:login"
 
@@ -148,8 +321,45 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 INTERNAL_IPS = [
     "127.0.0.1",
 ]
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-    }
+
+# Кэш: CACHE_BACKEND=locmem|file|sqlite|redis, CACHE_LOCATION -- путь к
+# каталогу/файлу или адрес Redis. При CACHE_TWO_TIER=1 перед общим кэшем
+# в каждом процессе работает небольшой LRU-кэш в памяти.
+CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", ""),
+    "file": (
+        "django.core.cache.backends.filebased.FileBasedCache",
+        os.path.join(BASE_DIR, "cache"),
+    ),
+    "sqlite": (
+        "core.cache_backends.SQLiteCache",
+        os.path.join(BASE_DIR, "cache.sqlite3"),
+    ),
+    "redis": ("django_redis.cache.RedisCache", "redis://127.0.0.1:6379/1"),
+}
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+if CACHE_BACKEND == "redis" and not importlib.util.find_spec("django_redis"):
+    # Молча подставленный локальный кэш разошёлся бы между серверами.
+    raise ImproperlyConfigured("CACHE_BACKEND=redis требует django-redis")
+cache_class, cache_location = CACHE_BACKENDS[CACHE_BACKEND]
+SHARED_CACHE = {
+    "BACKEND": cache_class,
+    "LOCATION": os.getenv("CACHE_LOCATION", cache_location),
+    "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 100000))},
 }
+if os.getenv("CACHE_TWO_TIER") == "1":
+    CACHES = {
+        "default": {
+            "BACKEND": "core.cache_backends.TwoTierCache",
+            "LOCATION": "default",
+            "OPTIONS": {
+                "SHARED": "shared",
+                "LOCAL_TIMEOUT": int(os.getenv("CACHE_LOCAL_TIMEOUT", 5)),
+                "LOCAL_MAX_ENTRIES": 1000,
+                "SHARED_ONLY_PREFIXES": ["feed-version:"],
+            },
+        },
+        "shared": SHARED_CACHE,
+    }
+else:
+    CACHES = {"default": SHARED_CACHE}
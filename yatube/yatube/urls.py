@@ -18,6 +18,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core import views as core_views
+
 handler404 = "core.views.page_not_found"
 handler403 = "core.views.csrf_failure"
 handler500 = "core.views.server_error"
@@ -28,6 +30,8 @@ urlpatterns = [
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
     path("about/", include("about.urls", namespace="about")),
+    path("api/v1/", include("posts.api_urls", namespace="api")),
+    path("metrics/", core_views.metrics, name="metrics"),
 ]
 
 if settings.DEBUG: